@@ -0,0 +1,288 @@
+'''
+Reproducible benchmarks for the cipher and cracking hot paths.
+
+    python benchmark.py                                  # default sizes
+    python benchmark.py --sizes 1KB,1MB,100MB --repeat 5
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json         # exit 1 on regressions
+
+Corpora are built from dictionary words with a fixed seed, so runs are
+comparable across machines and commits. Every case reports throughput,
+latency percentiles and peak traced memory, and the whole run is written
+as JSON.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import lexicon
+import ps4a
+import ps4b
+import ps4c
+import scoring
+from lexicon import WORDLIST_FILENAME, get_lexicon, is_word, load_words
+
+DEFAULT_SIZES = '1KB,64KB,1MB'
+DEFAULT_DICTIONARY_SIZES = '1000,10000,all'
+DEFAULT_OUTPUT = 'benchmark_results.json'
+SEED = 6001
+THRESHOLD = 0.25                # slowdown against the baseline that counts as a regression
+MIN_DELTA = 0.001               # seconds a case must also slow down by, so timer noise on short cases does not count
+
+_UNITS = {'B': 1, 'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30}
+
+def parse_size(text):
+    '''
+    text (string): a size such as '64KB' or '100MB'
+
+    Returns: the size in bytes (integer)
+    '''
+    text = text.strip().upper()
+    for unit in ('KB', 'MB', 'GB', 'B'):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * _UNITS[unit])
+    return int(text)
+
+def make_corpus(size, words, seed=SEED):
+    '''
+    size (integer): length of the corpus in characters
+    words (list): words to draw from
+
+    Returns: a string of random words, capitalization and punctuation of
+    exactly size characters. Large corpora repeat a 1 MB block so they are
+    quick to build.
+    '''
+    generator = random.Random(seed)
+    block_size = min(size, 1 << 20)
+    pieces = []
+    length = 0
+    while length < block_size:
+        word = generator.choice(words)
+        if generator.random() < 0.1:
+            word = word.capitalize()
+        if generator.random() < 0.08:
+            word += generator.choice('.,!?;')
+        pieces.append(word)
+        length += len(word) + 1
+    block = ' '.join(pieces)[:block_size]
+    return (block * (size // block_size + 1))[:size]
+
+def percentile(values, fraction):
+    '''
+    Returns: the value at fraction (0-1) of the sorted values, interpolated
+    '''
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def measure(run, setup=None, repeat=3, units=None):
+    '''
+    run (function): the code being measured, called with setup's result
+    setup (function): prepares fresh state for every call, not timed
+    repeat (integer): timed calls
+    units (integer): work done by one call (bytes, lookups...) for throughput
+
+    Returns: a dictionary of latency percentiles, throughput and peak memory
+    '''
+    latencies = []
+    for attempt in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        run(state)
+        latencies.append(time.perf_counter() - started)
+
+    # one more call under tracemalloc for the peak memory, which is slower
+    # and therefore not timed
+    state = setup() if setup else None
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    median = percentile(latencies, 0.5)
+    result = {'repeat': repeat, 'min': min(latencies), 'p50': median,
+              'p90': percentile(latencies, 0.9), 'p99': percentile(latencies, 0.99),
+              'max': max(latencies), 'peak_memory': peak}
+    if units:
+        result['units'] = units
+        result['throughput'] = units / median if median > 0 else float('inf')
+    return result
+
+def _cold_lexicon():
+    lexicon.forget_lexicons()
+    scoring.TOKEN_CACHE.clear()
+
+_CORPUS_CASES = ('apply_shift', 'apply_transpose', 'caesar.decrypt_message', 'vowel.decrypt_message')
+_DICTIONARY_CASES = ('load_words', 'get_lexicon.cold', 'is_word')
+
+def benchmark_cases(sizes, dictionary_sizes, words_file, workdir, only=None):
+    '''
+    workdir (string): a directory for the generated word lists
+    only (string): if given, build only cases whose name contains it
+
+    Yields: (name, parameters, run, setup, units) benchmark cases covering
+    the cipher, cracking, lexicon and permutation paths. Every corpus and
+    word list is made just before its cases, and not at all if none of
+    them is wanted.
+    '''
+    def wanted(names):
+        return [name for name in names if not only or only in name]
+
+    words = None
+    if (sizes and wanted(_CORPUS_CASES)) or (dictionary_sizes and wanted(_DICTIONARY_CASES)):
+        words = load_words(words_file)
+
+    for size in (sizes if wanted(_CORPUS_CASES) else ()):
+        cases = []
+        corpus = make_corpus(size, words)
+        plaintext = ps4b.PlaintextMessage(corpus, 7)
+        ciphertext = ps4b.CiphertextMessage(plaintext.get_message_text_encrypted())
+        submessage = ps4c.SubMessage(corpus)
+        transpose_dict = submessage.build_transpose_dict('eioua')
+        encrypted = ps4c.EncryptedSubMessage(submessage.apply_transpose(transpose_dict))
+        params = {'size': size}
+
+        cases.append(('apply_shift', params, lambda state, m=plaintext: m.apply_shift(7), None, size))
+        cases.append(('apply_transpose', params,
+                      lambda state, m=submessage, d=transpose_dict: m.apply_transpose(d), None, size))
+        cases.append(('caesar.decrypt_message', params,
+                      lambda state, m=ciphertext: m.decrypt_message(), scoring.TOKEN_CACHE.clear, size))
+        cases.append(('vowel.decrypt_message', params,
+                      lambda state, m=encrypted: m.decrypt_message(), scoring.TOKEN_CACHE.clear, size))
+        names = wanted(_CORPUS_CASES)
+        yield from (case for case in cases if case[0] in names)
+
+    for dictionary_size in (dictionary_sizes if wanted(_DICTIONARY_CASES) else ()):
+        cases = []
+        subset = words if dictionary_size is None else words[:dictionary_size]
+        path = os.path.join(workdir, 'words-%d.txt' % len(subset))
+        with open(path, 'w') as outfile:
+            outfile.write(' '.join(subset))
+        params = {'dictionary_size': len(subset)}
+        probes = [word for pair in zip(subset[::7], ('x' + word for word in subset[::7])) for word in pair]
+
+        cases.append(('load_words', params, lambda state, p=path: load_words(p), None, len(subset)))
+        cases.append(('get_lexicon.cold', params, lambda state, p=path: get_lexicon(p),
+                      _cold_lexicon, len(subset)))
+        if 'is_word' in wanted(_DICTIONARY_CASES):
+            # loaded here, outside the timed call, so only the lookups are measured
+            cases.append(('is_word', params,
+                          lambda state, l=get_lexicon(path), q=probes: [is_word(l, word) for word in q],
+                          None, len(probes)))
+        names = wanted(_DICTIONARY_CASES)
+        yield from (case for case in cases if case[0] in names)
+
+    for length in (5, 7, 8) if wanted(('get_permutations',)) else ():
+        sequence = 'abcdefgh'[:length]
+        yield ('get_permutations', {'length': length},
+               lambda state, s=sequence: ps4a.get_permutations(s), None,
+               ps4a.count_permutations(sequence))
+
+def run_benchmarks(sizes, dictionary_sizes, words_file=WORDLIST_FILENAME, repeat=3, only=None, log=None):
+    '''
+    sizes (list of integers): corpus sizes in bytes
+    dictionary_sizes (list): word list sizes, None meaning the whole list
+    words_file (string): the word list corpora and dictionaries come from
+    repeat (integer): timed calls per case
+    only (string): if given, run only cases whose name contains it
+    log (function): called with a line of progress per finished case
+
+    Returns: the results (dict), ready to be written as JSON
+    '''
+    results = []
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as workdir:
+        for name, params, run, setup, units in benchmark_cases(sizes, dictionary_sizes, words_file, workdir, only):
+            result = measure(run, setup, repeat, units)
+            result.update(name=name, params=params)
+            results.append(result)
+            if log:
+                log(format_result(result))
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': SEED, 'results': results}
+
+def case_key(result):
+    '''
+    Returns: a string identifying the case of result across runs
+    '''
+    return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+def format_result(result):
+    '''
+    Returns: result (dict) as one human readable line
+    '''
+    params = ' '.join('%s=%s' % item for item in sorted(result['params'].items()))
+    line = '%-24s %-24s p50 %9.3f ms  p90 %9.3f ms  peak %8.1f KB' % (
+        result['name'], params, result['p50'] * 1000, result['p90'] * 1000, result['peak_memory'] / 1024)
+    if 'throughput' in result:
+        line += '  %12.0f units/s' % result['throughput']
+    return line
+
+def compare(results, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    '''
+    results, baseline (dict): two runs of run_benchmarks
+    threshold (float): the slowdown, as a fraction, that counts
+    min_delta (float): the slowdown, in seconds, a case must also reach
+
+    Cases are compared on their fastest run, which is far less noisy than
+    the median over a few repeats, and short cases must slow down by
+    min_delta as well as by threshold to count.
+
+    Returns: a list of (case, baseline min, current min) for every case
+    whose fastest run slowed down by more than both limits
+    '''
+    previous = {case_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        old = previous.get(case_key(result))
+        if (old and result['min'] > old['min'] * (1 + threshold)
+                and result['min'] - old['min'] > min_delta):
+            regressions.append((case_key(result), old['min'], result['min']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the cipher and cracking hot paths.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma separated corpus sizes, e.g. 1KB,1MB,100MB')
+    parser.add_argument('--dictionary-sizes', default=DEFAULT_DICTIONARY_SIZES,
+                        help="comma separated word counts, 'all' for the whole list")
+    parser.add_argument('--words', default=WORDLIST_FILENAME, help='word list file')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--only', default=None, help='run only cases whose name contains this')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='where to write the JSON results')
+    parser.add_argument('--baseline', default=None, help='earlier results to check for regressions')
+    parser.add_argument('--save-baseline', default=None, help='also write the results here as the new baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='slowdown of the fastest run (fraction) reported as a regression')
+    parser.add_argument('--min-delta', type=float, default=MIN_DELTA,
+                        help='seconds a case must also slow down by to count as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    dictionary_sizes = [None if size.strip() == 'all' else int(size) for size in args.dictionary_sizes.split(',')]
+    results = run_benchmarks(sizes, dictionary_sizes, args.words, args.repeat, args.only, log=print)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            regressions = compare(results, json.load(infile), args.threshold, args.min_delta)
+        for case, old, new in regressions:
+            print('REGRESSION %s: min %.3f ms -> %.3f ms' % (case, old * 1000, new * 1000))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import string
+from functools import lru_cache
+
+BUFFER_CHUNK_SIZE = 1 << 16     # bytes translated at a time when writing into a buffer
+
+VOWELS_LOWER = 'aeiou'
+VOWELS_UPPER = 'AEIOU'
+
+# Translation tables are tiny (52 entries) and there are only 26 shifts and
+# 120 vowel permutations, so every table ever needed fits in these caches.
+
+@lru_cache(maxsize=None)
+def shift_table(shift):
+    '''
+    shift (integer): the amount by which to shift every letter of the
+    alphabet. Any integer is accepted and taken modulo 26.
+
+    Returns: a str.translate table mapping every uppercase and lowercase
+    letter to the letter shift places down the alphabet
+    '''
+    shift = shift % 26
+    lower = string.ascii_lowercase
+    upper = string.ascii_uppercase
+    return str.maketrans(lower + upper,
+                         lower[shift:] + lower[:shift] + upper[shift:] + upper[:shift])
+
+@lru_cache(maxsize=None)
+def transpose_table(vowels_permutation):
+    '''
+    vowels_permutation (string): a permutation of the vowels. The first
+    letter is what a maps to, the second what e maps to, and so on.
+
+    Returns: a str.translate table applying the permutation to both
+    lowercase and uppercase vowels, leaving every other character alone
+    '''
+    return str.maketrans(VOWELS_LOWER + VOWELS_UPPER,
+                         vowels_permutation.lower() + vowels_permutation.upper())
+
+@lru_cache(maxsize=1024)
+def _table_from_items(items):
+    return str.maketrans(dict(items))
+
+def table_from_dict(mapping):
+    '''
+    mapping (dict): maps single letters to single letters, as returned by
+    build_shift_dict or build_transpose_dict
+
+    Returns: the equivalent str.translate table. Tables are cached, so
+    translating with the same dictionary again does not rebuild it.
+    '''
+    return _table_from_items(tuple(sorted(mapping.items())))
+
+_bytes_tables = {}              # id of a str table -> (str table, bytes table)
+
+def bytes_table(table):
+    '''
+    table (dict): a str.translate table whose entries are all ASCII
+
+    Returns: the equivalent 256 byte table for bytes.translate. Bytes the
+    table does not mention, including every non-ASCII byte, map to
+    themselves. Conversions are cached, so this is cheap to call per message.
+    '''
+    entry = _bytes_tables.get(id(table))
+    if entry is None or entry[0] is not table:
+        translated = bytearray(range(256))
+        for source, target in table.items():
+            # str.maketrans keeps single character values as strings
+            translated[source] = ord(target) if isinstance(target, str) else target
+        entry = (table, bytes(translated))
+        _bytes_tables[id(table)] = entry
+    return entry[1]
+
+def translate_buffer(data, table, out=None, chunk_size=BUFFER_CHUNK_SIZE):
+    '''
+    data (bytes, bytearray or memoryview): the bytes to transform
+    table (bytes): a 256 byte table, see bytes_table
+    out (writable buffer): if given, where the result is written. It must
+    be at least as long as data and may be data itself to transform in
+    place. The work is done chunk_size bytes at a time, so no copy of the
+    whole payload is made.
+    chunk_size (integer): bytes translated per step when out is given
+
+    Returns: out if it was given, otherwise the translated bytes (a
+    bytearray for bytearray input, bytes otherwise)
+    '''
+    if out is None:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return data.translate(table)
+
+    view = memoryview(data).cast('B')
+    target = memoryview(out).cast('B')
+    if len(target) < len(view):
+        raise ValueError('output buffer is smaller than the input')
+    for start in range(0, len(view), chunk_size):
+        end = min(start + chunk_size, len(view))
+        target[start:end] = view[start:end].tobytes().translate(table)
+    return out
+
+def apply_table(text, table, out=None):
+    '''
+    text (string, bytes, bytearray or memoryview): the text to transform.
+    Byte input is treated as ASCII; bytes that are not letters are left
+    untouched.
+    table (dict): a table from shift_table, transpose_table or
+    table_from_dict
+    out (writable buffer): for byte input only, where to write the result
+    instead of returning a new object; see translate_buffer
+
+    Returns: text with every character looked up in table, in a single
+    linear pass, of the same kind as text (or out, if it was given)
+    '''
+    if isinstance(text, str):
+        if out is not None:
+            raise TypeError('an output buffer can only be used with bytes input')
+        return text.translate(table)
+    return translate_buffer(text, bytes_table(table), out)
+
+def invert_vowels_permutation(vowels_permutation):
+    '''
+    vowels_permutation (string): a permutation of the vowels used to encrypt
+
+    Returns: the permutation (string) that undoes it, e.g. 'eaiuo' for
+    'eaiuo' and 'uaeio' for 'eioua'
+    '''
+    vowels_permutation = vowels_permutation.lower()
+    return ''.join(VOWELS_LOWER[vowels_permutation.index(vowel)] for vowel in VOWELS_LOWER)
+
+def cipher_table(cipher, key, decrypt=False):
+    '''
+    cipher (string): 'caesar' or 'vowel'
+    key (integer or string): the shift for 'caesar', the vowel
+    permutation for 'vowel'
+    decrypt (boolean): if True, return the table that undoes key
+
+    Returns: the translation table for that cipher and key
+    '''
+    if cipher == 'caesar':
+        key = int(key)
+        return shift_table(-key if decrypt else key)
+    if cipher == 'vowel':
+        if sorted(key.lower()) != sorted(VOWELS_LOWER):
+            raise ValueError('vowel key must be a permutation of %r, got %r' % (VOWELS_LOWER, key))
+        return transpose_table(invert_vowels_permutation(key) if decrypt else key)
+    raise ValueError('unknown cipher %r, expected caesar or vowel' % (cipher,))
+
+def candidate_keys(cipher):
+    '''
+    cipher (string): 'caesar' or 'vowel'
+
+    Returns: a list of every key a cracker should try, in the order the
+    original crackers tried them: shifts 25 down to 1 for 'caesar', the
+    vowel permutations in get_permutations order for 'vowel'
+    '''
+    if cipher == 'caesar':
+        return list(range(25, 0, -1))
+    if cipher == 'vowel':
+        from ps4a import get_permutations
+        return get_permutations(VOWELS_LOWER)
+    raise ValueError('unknown cipher %r, expected caesar or vowel' % (cipher,))
@@ -0,0 +1,187 @@
+'''
+Non-interactive command line for both ciphers. Reads files or standard
+input in chunks, so arbitrarily large inputs are processed in constant
+memory.
+
+    python cli.py encrypt --cipher caesar --key 3 story.txt
+    python cli.py decrypt --cipher vowel --key eaiuo < secret.txt
+    python cli.py crack --cipher caesar -o plain.txt big.log
+    python cli.py batch --cipher vowel --workers 8 messages.jsonl -o plain.jsonl
+    python cli.py compile --words words.txt
+    python cli.py dictionaries english
+    python cli.py serve --port 8765
+    python cli.py serve --dictionary french=fr.txt --dictionary both=words.txt,fr.txt
+    python cli.py --profile crack big.log > /dev/null
+    python cli.py --profile-dump crack.prof crack big.log > /dev/null
+'''
+import argparse
+import sys
+
+import stream
+
+# Only what encrypt and decrypt need is imported up front, so calls with a
+# known key start quickly and never touch the word list. The lexicon,
+# scoring, process pool, JSON and asyncio modules are imported by the
+# commands that use them.
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Encrypt, decrypt or crack Caesar and vowel ciphers.')
+    parser.add_argument('--profile', action='store_true',
+                        help='print timers and counters of the hot paths to stderr when done')
+    parser.add_argument('--profile-dump', metavar='FILE', default=None,
+                        help='run under cProfile and write the stats to FILE (read with python -m pstats)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('encrypt', 'encrypt with a known key'),
+                            ('decrypt', 'decrypt with a known key'),
+                            ('crack', 'decrypt without the key')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--cipher', choices=('caesar', 'vowel'), default='caesar')
+        if name != 'crack':
+            command.add_argument('--key', required=True,
+                                 help='the shift for caesar, a permutation of aeiou for vowel')
+        else:
+            command.add_argument('--sample-words', type=int, default=stream.SAMPLE_WORDS,
+                                 help='number of leading words used to choose the key')
+            command.add_argument('--words', default=None,
+                                 help='word list file or dictionary name (default: words.txt)')
+        command.add_argument('input', nargs='?', default='-', help="input file, '-' for stdin")
+        command.add_argument('-o', '--output', default='-', help="output file, '-' for stdout")
+        command.add_argument('--chunk-size', type=int, default=stream.CHUNK_SIZE)
+
+    batch = commands.add_parser('batch', help='crack one ciphertext per line on a process pool')
+    batch.add_argument('--cipher', choices=('caesar', 'vowel'), default='caesar')
+    batch.add_argument('--words', default=None, help='word list file or dictionary name (default: words.txt)')
+    batch.add_argument('--workers', type=int, default=None, help='worker processes, default one per CPU')
+    batch.add_argument('--batch-size', type=int, default=None,
+                       help='ciphertexts per worker task (default: parallel.BATCH_CHUNK_SIZE)')
+    batch.add_argument('--unordered', action='store_true', help='write results as soon as they are ready')
+    batch.add_argument('--jsonl', action='store_true', default=None,
+                       help='input lines are JSON (default: guessed from the extension)')
+    batch.add_argument('input', help='file with one ciphertext per line')
+    batch.add_argument('-o', '--output', default='-', help="JSONL output file, '-' for stdout")
+
+    compile_words = commands.add_parser('compile', help='precompile a word list for fast memory mapped loading')
+    compile_words.add_argument('--words', default=None, help='word list file (default: words.txt)')
+    compile_words.add_argument('-o', '--output', default=None, help='compiled file, default WORDS.lex')
+
+    dictionaries = commands.add_parser('dictionaries', help='load dictionaries and report their size and load time')
+    dictionaries.add_argument('names', nargs='*', help='dictionary names or word list files (default: all registered)')
+
+    serve = commands.add_parser('serve', help='run the newline-delimited JSON service (see service.py)')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--unix', default=None, help='listen on this Unix socket path instead of TCP')
+    serve.add_argument('--workers', type=int, default=None, help='executor processes, default one per CPU')
+    serve.add_argument('--dictionary', action='append', default=[], metavar='NAME=FILE[,FILE...]',
+                       help='register a dictionary clients may ask for by name (repeatable)')
+    return parser
+
+def words_file(args):
+    from lexicon import WORDLIST_FILENAME
+    return args.words or WORDLIST_FILENAME
+
+def run_batch(args):
+    import json
+    import parallel
+
+    def report(stats):
+        print('\r' + repr(stats), end='', file=sys.stderr)
+
+    outfile = stream.open_output(args.output)
+    try:
+        results = parallel.crack_batch(parallel.read_ciphertexts(args.input, args.jsonl), args.cipher,
+                                       args.workers, args.batch_size or parallel.BATCH_CHUNK_SIZE,
+                                       not args.unordered,
+                                       words_file(args), report=report)
+        for index, key, text in results:
+            outfile.write(json.dumps({'index': index, 'key': key, 'text': text}) + '\n')
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+        print(file=sys.stderr)
+
+def report_dictionaries(args):
+    from lexicon import dictionary_files, dictionary_names, get_dictionary
+
+    for name in args.names or dictionary_names():
+        lexicon = get_dictionary(name)
+        print('%-12s %10d words  loaded in %8.3f s  %10.1f MB  %s' % (
+            name, len(lexicon), lexicon.load_seconds, lexicon.memory_usage() / (1 << 20),
+            ', '.join(dictionary_files(name))))
+
+def register_dictionaries(specs):
+    from lexicon import get_dictionary, register_dictionary
+
+    for spec in specs:
+        name, separator, file_names = spec.partition('=')
+        if not name or not separator or not file_names:
+            raise ValueError('--dictionary expects NAME=FILE[,FILE...], got %r' % (spec,))
+        register_dictionary(name, *file_names.split(','))
+        # loaded now so a bad file fails at start up, and forked executor
+        # processes share it
+        get_dictionary(name)
+
+def run(args):
+    if args.command == 'serve':
+        import asyncio
+        import service
+        register_dictionaries(args.dictionary)
+        try:
+            asyncio.run(service.serve(args.host, args.port, args.unix,
+                                      service.CipherService(workers=args.workers)))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'compile':
+        from lexicon import compile_lexicon
+        print('compiled', compile_lexicon(words_file(args), args.output), file=sys.stderr)
+    elif args.command == 'batch':
+        run_batch(args)
+    elif args.command == 'dictionaries':
+        report_dictionaries(args)
+    elif args.command == 'crack':
+        from lexicon import get_dictionary
+        key = stream.crack_file(args.input, args.output, args.cipher, get_dictionary(words_file(args), compiled=True),
+                                args.sample_words, args.chunk_size)
+        print('key:', key, file=sys.stderr)
+    else:
+        stream.transform_file(args.input, args.output, args.cipher, args.key,
+                              args.command == 'decrypt', args.chunk_size)
+
+def run_profiled(args):
+    # instrumentation only costs anything while a sink is installed, so the
+    # recorder is only set up when asked for
+    import metrics
+    recorder = metrics.Recorder() if args.profile else None
+    profiler = None
+    if args.profile_dump:
+        import cProfile
+        profiler = cProfile.Profile()
+    previous = metrics.set_sink(recorder)
+    try:
+        if profiler:
+            profiler.runcall(run, args)
+        else:
+            run(args)
+    finally:
+        metrics.set_sink(previous)
+        if profiler:
+            profiler.dump_stats(args.profile_dump)
+            print('profile written to', args.profile_dump, file=sys.stderr)
+        if recorder:
+            print(recorder.summary(), file=sys.stderr)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.profile or args.profile_dump:
+            run_profiled(args)
+        else:
+            run(args)
+    except (OSError, ValueError) as error:
+        print('error:', error, file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
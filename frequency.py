@@ -0,0 +1,60 @@
+import string
+from collections import Counter
+
+# relative frequency (percent) of each letter a-z in English text
+ENGLISH_LETTER_FREQUENCIES = (
+    8.167, 1.492, 2.782, 4.253, 12.702, 2.228, 2.015, 6.094, 6.966, 0.153,
+    0.772, 4.025, 2.406, 6.749, 7.507, 1.929, 0.095, 5.987, 6.327, 9.056,
+    2.758, 0.978, 2.360, 0.150, 1.974, 0.074,
+)
+
+def letter_histogram(text):
+    '''
+    text (string): any text
+
+    Returns: a list of 26 integers, the number of times each letter a-z
+    appears in text, ignoring capitalization. The text is read once.
+    '''
+    counts = Counter(text)
+    return [counts[lower] + counts[upper]
+            for lower, upper in zip(string.ascii_lowercase, string.ascii_uppercase)]
+
+def chi_squared(histogram, expected=ENGLISH_LETTER_FREQUENCIES):
+    '''
+    histogram (list): 26 letter counts
+    expected (sequence): 26 relative letter frequencies
+
+    Returns: the chi-squared statistic (float) of histogram against
+    expected. Lower means the counts look more like expected.
+    '''
+    total = sum(histogram)
+    if total == 0:
+        return 0.0
+    scale = total / sum(expected)
+    statistic = 0.0
+    for observed, frequency in zip(histogram, expected):
+        expected_count = frequency * scale
+        statistic += (observed - expected_count) ** 2 / expected_count
+    return statistic
+
+def shift_scores(histogram, expected=ENGLISH_LETTER_FREQUENCIES):
+    '''
+    histogram (list): 26 letter counts of a Caesar encrypted text
+
+    Returns: a list of 26 chi-squared scores, where scores[shift] is the
+    score of the text decrypted with apply_shift(shift). Only the histogram
+    is rotated, so this costs 26*26 operations whatever the text length.
+    '''
+    # decrypting with shift moves the count of cipher letter i to letter i + shift
+    return [chi_squared([histogram[(letter - shift) % 26] for letter in range(26)], expected)
+            for shift in range(26)]
+
+def rank_shifts(text):
+    '''
+    text (string): Caesar encrypted text
+
+    Returns: every shift 0-25 ordered from most to least likely to decrypt
+    text, according to English letter frequencies
+    '''
+    scores = shift_scores(letter_histogram(text))
+    return sorted(range(26), key=lambda shift: scores[shift])
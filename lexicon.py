@@ -0,0 +1,486 @@
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import metrics
+
+WORDLIST_FILENAME = 'words.txt'
+
+PUNCTUATION = " !@#$%^&*()-_+={}[]|\\:;'<>?,./\""
+
+READ_CHUNK_SIZE = 1 << 20       # characters read at a time by load_words
+LOAD_CHUNK_SIZE = 1 << 24       # bytes of a word list normalized per task
+PARALLEL_LOAD_SIZE = 1 << 26    # word lists above this many bytes are loaded on a process pool
+
+def load_words(file_name):
+    '''
+    file_name (string): the name of the file containing
+    the list of words to load
+
+    Returns: a list of valid words. Words are strings of lowercase letters.
+
+    Depending on the size of the word list, this function may
+    take a while to finish. Messages should use get_lexicon instead,
+    which only reads the file once per process.
+    '''
+    # inFile: file
+    inFile = open(resolve_path(file_name), 'r')
+    # wordlist: list of strings
+    wordlist = []
+    # large reads instead of one per line; a word cut at the end of a read
+    # is carried over to the next one
+    tail = ''
+    while True:
+        chunk = inFile.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        words = (tail + chunk).lower().split()
+        tail = words.pop() if words and not chunk[-1].isspace() else ''
+        wordlist.extend(words)
+    if tail:
+        wordlist.append(tail)
+    inFile.close()
+    return wordlist
+
+def is_word(word_list, word):
+    '''
+    Determines if word is a valid word, ignoring
+    capitalization and punctuation
+
+    word_list (Lexicon, set or list): the words in the dictionary.
+    word (string): a possible word.
+
+    Returns: True if word is in word_list, False otherwise
+
+    Example:
+    >>> is_word(word_list, 'bat') returns
+    True
+    >>> is_word(word_list, 'asdf') returns
+    False
+    '''
+    word = word.lower()
+    word = word.strip(PUNCTUATION)
+    return word in word_list
+
+
+def resolve_path(file_name):
+    '''
+    file_name (string): a word list path, relative to the current directory
+    or to the directory this module lives in
+
+    Returns: the path that exists, preferring the current directory so the
+    original behaviour of running from the repository root is unchanged
+    '''
+    if os.path.exists(file_name) or os.path.isabs(file_name):
+        return file_name
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+
+
+_WHITESPACE = re.compile(rb'\s')
+
+def _chunk_bounds(path, chunk_size):
+    # byte ranges of about chunk_size covering the file, each ending on
+    # whitespace so no word is cut in two. UTF-8 never uses ASCII bytes
+    # inside a multi-byte character, so the ranges are also valid text.
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    bounds = []
+    with open(path, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            match = _WHITESPACE.search(data, min(start + chunk_size, size))
+            end = match.end() if match else size
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+def _normalize_range(path, start, end):
+    # the distinct lowercase words between two byte offsets of path; runs in
+    # the worker processes of load_word_set
+    with open(path, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end].decode('utf-8')
+    return set(text.lower().split())
+
+def load_word_set(file_names, workers=None, chunk_size=LOAD_CHUNK_SIZE):
+    '''
+    file_names (string or list of strings): one or more word lists, e.g. one
+    per language, whose words are merged
+    workers (integer): processes normalizing chunks at the same time. By
+    default one per CPU when the lists add up to more than
+    PARALLEL_LOAD_SIZE bytes, otherwise everything is done here.
+    chunk_size (integer): bytes read and normalized per task
+
+    Returns: a set of the distinct lowercase words of all the files. Files
+    are memory mapped and cut into chunks at whitespace; every chunk is
+    lowercased, split and de-duplicated on its own, so workers only send
+    back distinct words to be merged.
+    '''
+    if isinstance(file_names, str):
+        file_names = [file_names]
+    paths = [resolve_path(file_name) for file_name in file_names]
+    tasks = [(path, start, end) for path in paths for start, end in _chunk_bounds(path, chunk_size)]
+    if workers is None:
+        large = sum(os.path.getsize(path) for path in paths) > PARALLEL_LOAD_SIZE
+        workers = (os.cpu_count() or 1) if large else 1
+
+    if workers > 1 and len(tasks) > 1:
+        # imported here, process pools are slow to import
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+            return _merge(pool.map(_normalize_range, *zip(*tasks)))
+    return _merge(_normalize_range(*task) for task in tasks)
+
+def _merge(parts):
+    # the first part becomes the result, so a single chunk is never copied
+    words = None
+    for part in parts:
+        if words is None:
+            words = part
+        else:
+            words.update(part)
+    return words if words is not None else set()
+
+
+class Lexicon(object):
+    '''
+    An immutable set of lowercase words. A single Lexicon is shared by every
+    message in the process, so membership tests are O(1) hash lookups and
+    the word list is only read from disk once.
+    '''
+    def __init__(self, words, name=None):
+        '''
+        words (iterable of strings): the words in the dictionary
+        name (string): where the words came from, used in reprs and caches
+        '''
+        self.words = frozenset(words)
+        self.name = name
+        self.load_seconds = None
+        # bound C method, for callers testing many words in bulk
+        self.contains = self.words.__contains__
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __repr__(self):
+        return 'Lexicon(%r, %d words)' % (self.name, len(self.words))
+
+    def is_word(self, word):
+        '''
+        Same as is_word(self, word): ignores capitalization and punctuation.
+        '''
+        return is_word(self.words, word)
+
+    def memory_usage(self):
+        '''
+        Returns: the bytes (integer) taken by the set and its words. Every
+        word is measured, so this takes a moment on large dictionaries.
+        '''
+        return sys.getsizeof(self.words) + sum(map(sys.getsizeof, self.words))
+
+
+# Compiled lexicon file layout, all integers in native byte order:
+#   magic, byte order, size and mtime of the source word list, word count,
+#   count + 1 uint32 offsets into the data, then the sorted words packed
+#   back to back as UTF-8.
+COMPILED_MAGIC = b'LEX1'
+COMPILED_SUFFIX = '.lex'
+_HEADER = struct.Struct('=4scQqI')
+_OFFSET = struct.Struct('=I')
+_BYTE_ORDER = sys.byteorder[0].encode()
+
+def compiled_path(file_name):
+    '''
+    Returns: where the compiled form of the word list file_name is kept
+    '''
+    return resolve_path(file_name) + COMPILED_SUFFIX
+
+def compile_lexicon(file_name, output=None):
+    '''
+    file_name (string): the word list to compile
+    output (string): where to write it, defaults to compiled_path(file_name)
+
+    Writes the words of file_name, de-duplicated and sorted, in the compact
+    binary format read by CompiledLexicon. The file is written to a
+    temporary name first, so readers never see a half written file.
+
+    Returns: the path of the compiled file
+    '''
+    source = resolve_path(file_name)
+    output = output or compiled_path(file_name)
+    status = os.stat(source)
+    words = sorted(word.encode('utf-8') for word in load_word_set(source))
+
+    offsets = array('I', [0])
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+
+    temporary = '%s.%d.tmp' % (output, os.getpid())
+    with open(temporary, 'wb') as outfile:
+        outfile.write(_HEADER.pack(COMPILED_MAGIC, _BYTE_ORDER, status.st_size,
+                                   status.st_mtime_ns, len(words)))
+        offsets.tofile(outfile)
+        outfile.write(b''.join(words))
+    os.replace(temporary, output)
+    return output
+
+def _expected_length(count, last_offset):
+    # the length of a complete compiled file holding count words
+    return _HEADER.size + _OFFSET.size * (count + 1) + last_offset
+
+def _is_current(compiled, source):
+    # the compiled file is valid if it was built here from the same version
+    # of the source word list and is complete; a truncated or corrupt file
+    # counts as stale, so it gets rebuilt
+    try:
+        with open(compiled, 'rb') as infile:
+            header = infile.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return False
+            magic, byte_order, size, mtime_ns, count = _HEADER.unpack(header)
+            infile.seek(_HEADER.size + _OFFSET.size * count)
+            last_offset = infile.read(_OFFSET.size)
+            length = os.fstat(infile.fileno()).st_size
+        status = os.stat(source)
+    except OSError:
+        return False
+    return (magic == COMPILED_MAGIC and byte_order == _BYTE_ORDER
+            and size == status.st_size and mtime_ns == status.st_mtime_ns
+            and len(last_offset) == _OFFSET.size
+            and length == _expected_length(count, _OFFSET.unpack(last_offset)[0]))
+
+class _PackedWords(object):
+    # a sequence view of the packed words, so bisect can search them; only
+    # the word being compared is copied out of the map
+    def __init__(self, data, offsets, start):
+        self.data = data
+        self.offsets = offsets
+        self.start = start
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.data[self.start + self.offsets[index]:self.start + self.offsets[index+1]]
+
+class CompiledLexicon(object):
+    '''
+    A Lexicon read from a file written by compile_lexicon. The file is
+    memory mapped and searched in place with a binary search, so loading
+    it costs a few system calls instead of parsing the whole word list,
+    and the pages are shared by every process that maps it.
+    '''
+    def __init__(self, path, name=None):
+        '''
+        path (string): the compiled lexicon file
+        name (string): where the words came from, used in reprs and caches
+        '''
+        self.name = name or path
+        self.load_seconds = None
+        with open(path, 'rb') as infile:
+            self.map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < _HEADER.size:
+            raise ValueError('%s is truncated' % path)
+        magic, byte_order, size, mtime_ns, count = _HEADER.unpack_from(self.map)
+        if magic != COMPILED_MAGIC or byte_order != _BYTE_ORDER:
+            raise ValueError('%s is not a compiled lexicon for this machine' % path)
+        data_start = _HEADER.size + _OFFSET.size * (count + 1)
+        if len(self.map) < data_start:
+            raise ValueError('%s is truncated' % path)
+        last_offset = _OFFSET.unpack_from(self.map, data_start - _OFFSET.size)[0]
+        if len(self.map) != _expected_length(count, last_offset):
+            raise ValueError('%s is truncated or corrupt' % path)
+        offsets = memoryview(self.map)[_HEADER.size:data_start].cast('I')
+        self.words = _PackedWords(self.map, offsets, data_start)
+
+    def __contains__(self, word):
+        try:
+            word = word.encode('utf-8')
+        except AttributeError:
+            return False
+        index = bisect_left(self.words, word)
+        return index < len(self.words) and self.words[index] == word
+
+    def __iter__(self):
+        for index in range(len(self.words)):
+            yield self.words[index].decode('utf-8')
+
+    def __len__(self):
+        return len(self.words)
+
+    def __repr__(self):
+        return 'CompiledLexicon(%r, %d words)' % (self.name, len(self.words))
+
+    def is_word(self, word):
+        '''
+        Same as is_word(self, word): ignores capitalization and punctuation.
+        '''
+        return is_word(self, word)
+
+    def memory_usage(self):
+        '''
+        Returns: the bytes (integer) mapped. The pages are shared with every
+        other process mapping the same file and only read in as needed.
+        '''
+        return len(self.map)
+
+def load_compiled_lexicon(file_name=WORDLIST_FILENAME, rebuild=True):
+    '''
+    file_name (string): the source word list
+    rebuild (boolean): if True, (re)compile the word list when the compiled
+    file is missing or older than the source
+
+    Returns: a CompiledLexicon of file_name, or a regular Lexicon if no
+    current compiled file exists and one cannot be written
+    '''
+    source = resolve_path(file_name)
+    compiled = compiled_path(file_name)
+    if not _is_current(compiled, source):
+        if not rebuild:
+            return Lexicon(load_word_set(source), name=file_name)
+        try:
+            compile_lexicon(source, compiled)
+        except OSError:
+            # read-only location: fall back to parsing the text file
+            return Lexicon(load_word_set(source), name=file_name)
+    return CompiledLexicon(compiled, name=file_name)
+
+
+_lexicons = {}                  # (resolved paths, compiled) -> Lexicon
+_lexicons_lock = threading.Lock()
+# the same lexicons by the name they were asked for, so repeated lookups
+# skip resolving paths and checking the file system
+_files = {}                     # (file name, compiled) -> Lexicon
+_named = {}                     # (dictionary name, compiled) -> Lexicon
+
+def forget_lexicons():
+    '''
+    Drops every loaded lexicon, so the next lookups load them again.
+
+    Returns: nothing
+    '''
+    with _lexicons_lock:
+        _lexicons.clear()
+        _files.clear()
+        _named.clear()
+
+def get_lexicon(file_name=WORDLIST_FILENAME, compiled=False):
+    '''
+    file_name (string): the name of the file containing the words
+    compiled (boolean): if True, use the memory mapped compiled form of the
+    word list (see load_compiled_lexicon), which loads much faster but
+    answers lookups with a binary search instead of a hash lookup
+
+    Returns: the process-wide Lexicon for file_name, loading it on the
+    first call only. Later calls return the same object.
+    '''
+    lexicon = _files.get((file_name, compiled))
+    if lexicon is None:
+        lexicon = _files[file_name, compiled] = _get_lexicon((file_name,), file_name, compiled)
+    return lexicon
+
+def _get_lexicon(file_names, name, compiled):
+    key = (tuple(os.path.abspath(resolve_path(file_name)) for file_name in file_names), compiled)
+    lexicon = _lexicons.get(key)
+    if lexicon is None:
+        with _lexicons_lock:
+            lexicon = _lexicons.get(key)
+            if lexicon is None:
+                with metrics.timer('lexicon.load'):
+                    started = time.perf_counter()
+                    lexicon = _load(key[0], name, compiled)
+                    lexicon.load_seconds = time.perf_counter() - started
+                _lexicons[key] = lexicon
+    return lexicon
+
+def _load(paths, name, compiled):
+    # only single word lists have a compiled form
+    if compiled and len(paths) == 1:
+        lexicon = load_compiled_lexicon(paths[0])
+        lexicon.name = name
+        return lexicon
+    return Lexicon(load_word_set(paths), name=name)
+
+
+DEFAULT_DICTIONARY = 'english'
+
+_dictionaries = {DEFAULT_DICTIONARY: (WORDLIST_FILENAME,)}     # name -> word list files
+
+def register_dictionary(name, *file_names):
+    '''
+    name (string): the name crackers will refer to the dictionary by
+    file_names (strings): its word lists, merged into a single Lexicon when
+    it is first used, e.g. one file per language
+
+    Returns: nothing. Registering a name again replaces the dictionary.
+    '''
+    if not file_names:
+        raise ValueError('dictionary %r needs at least one word list' % (name,))
+    with _lexicons_lock:
+        _dictionaries[name] = tuple(file_names)
+        # None stands for the default dictionary in the name cache
+        for cached in ((name, None) if name == DEFAULT_DICTIONARY else (name,)):
+            _named.pop((cached, False), None)
+            _named.pop((cached, True), None)
+
+def ensure_dictionary(name, *file_names):
+    '''
+    Registers name for file_names unless it already is, so that what was
+    loaded for it is kept. The registry is per process: worker processes
+    use this to take over a dictionary their parent resolved with
+    dictionary_files.
+
+    Returns: nothing
+    '''
+    if _dictionaries.get(name) != tuple(file_names):
+        register_dictionary(name, *file_names)
+
+def dictionary_names():
+    '''
+    Returns: a sorted list of the registered dictionary names
+    '''
+    return sorted(_dictionaries)
+
+def dictionary_files(name=None):
+    '''
+    name (string): a registered dictionary name or a word list file, the
+    default dictionary if None
+
+    Returns: a tuple of the word list files of the dictionary
+    '''
+    name = name or DEFAULT_DICTIONARY
+    if name in _dictionaries:
+        return _dictionaries[name]
+    if os.path.exists(resolve_path(name)):
+        return (name,)
+    raise ValueError('unknown dictionary %r, expected a word list file or one of %s'
+                     % (name, ', '.join(dictionary_names())))
+
+def get_dictionary(name=None, compiled=False):
+    '''
+    name (string): a registered dictionary name or a word list file, the
+    default dictionary if None
+    compiled (boolean): as for get_lexicon; ignored for dictionaries made
+    of several word lists
+
+    Returns: the process-wide Lexicon of the dictionary, loaded on first
+    use. Its load_seconds attribute and memory_usage method report what
+    loading it cost.
+    '''
+    lexicon = _named.get((name, compiled))
+    if lexicon is None:
+        lexicon = _get_lexicon(dictionary_files(name), name or DEFAULT_DICTIONARY, compiled)
+        _named[name, compiled] = lexicon
+    return lexicon
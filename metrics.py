@@ -0,0 +1,156 @@
+'''
+Optional instrumentation of the decryption hot paths.
+
+Instrumented code reports named events through count and timer. Nothing is
+recorded unless a sink is installed, and while none is, both are a single
+global check:
+
+    recorder = metrics.Recorder()
+    with metrics.recording(recorder):
+        CiphertextMessage(text).decrypt_message()
+    print(recorder.summary())
+
+A sink is any callable taking (name, value). Counters report the amount
+counted and timers the elapsed seconds, so a sink can forward both to a
+monitoring system unchanged. Only the current process is measured; work
+done in a process pool is not reported.
+
+Events reported:
+    lexicon.load          seconds spent reading a word list (get_lexicon)
+    candidate.transform   seconds spent translating and checking the tokens
+                          of one candidate key (score_bag)
+    tokens.scored         distinct tokens checked for one candidate key
+    cache.hits            token lookups answered by the token cache
+    cache.misses          token lookups the token cache had to compute
+    candidates.pruned     keys dropped early by progressive_search
+    caesar.*, vowel.*     seconds spent in each decrypt_message variant
+'''
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+_sink = None
+
+def set_sink(sink):
+    '''
+    sink (callable): called with (name, value) for every event, or None to
+    turn instrumentation off
+
+    Returns: the sink that was installed before
+    '''
+    global _sink
+    previous = _sink
+    _sink = sink
+    return previous
+
+def enabled():
+    '''
+    Returns: True if a sink is installed
+    '''
+    return _sink is not None
+
+def count(name, value=1):
+    '''
+    Reports value (a number) under name if a sink is installed.
+    '''
+    if _sink is not None:
+        _sink(name, value)
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class _Timer(object):
+    def __init__(self, name, sink):
+        self.name = name
+        self.sink = sink
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sink(self.name, time.perf_counter() - self.started)
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name):
+    '''
+    Returns: a context manager reporting the seconds spent in its block
+    under name, or a shared no-op one if no sink is installed
+    '''
+    if _sink is None:
+        return _NULL_TIMER
+    return _Timer(name, _sink)
+
+def timed(name):
+    '''
+    Returns: a decorator that reports the seconds spent in every call of the
+    decorated function under name
+    '''
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _sink is None:
+                return function(*args, **kwargs)
+            with _Timer(name, _sink):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class Recorder(object):
+    '''
+    A sink that aggregates events: for every name, how many were reported
+    and the total of their values.
+    '''
+    def __init__(self):
+        self.events = {}            # name -> [number of events, total]
+        self.lock = threading.Lock()
+
+    def __call__(self, name, value):
+        with self.lock:
+            event = self.events.get(name)
+            if event is None:
+                self.events[name] = [1, value]
+            else:
+                event[0] += 1
+                event[1] += value
+
+    def totals(self):
+        '''
+        Returns: a dictionary mapping every name to its total
+        '''
+        with self.lock:
+            return {name: event[1] for name, event in self.events.items()}
+
+    def summary(self):
+        '''
+        Returns: a table of the recorded events (string), one line per name.
+        Timer totals are seconds.
+        '''
+        with self.lock:
+            events = sorted(self.events.items())
+        lines = ['%-36s %10s %14s %14s' % ('event', 'count', 'total', 'mean')]
+        for name, (number, total) in events:
+            lines.append('%-36s %10d %14.6g %14.6g' % (name, number, total, total / number))
+        return '\n'.join(lines)
+
+@contextmanager
+def recording(sink=None):
+    '''
+    sink (callable): the sink to install, a new Recorder by default
+
+    Installs sink for the duration of the with block and yields it. The
+    sink that was installed before is restored afterwards.
+    '''
+    sink = sink if sink is not None else Recorder()
+    previous = set_sink(sink)
+    try:
+        yield sink
+    finally:
+        set_sink(previous)
@@ -0,0 +1,248 @@
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from cipher import apply_table, candidate_keys, cipher_table
+from lexicon import DEFAULT_DICTIONARY, WORDLIST_FILENAME, dictionary_files, ensure_dictionary, get_dictionary
+from scoring import iter_tokens, progressive_search, score_bag, token_bag
+
+BATCH_CHUNK_SIZE = 256          # ciphertexts sent to a worker per task
+
+_worker_lexicon = None          # the lexicon of the current worker process
+_shared_text = None             # the text being sharded, inherited by forked workers
+
+WHITESPACE = re.compile(r'\s')
+
+def _init_worker(words_file, file_names):
+    # the dictionary registry is per process, and a worker started by spawn
+    # or forkserver does not see the parent's, so the files resolved in the
+    # parent are registered here too. With the fork start method the parent
+    # has already loaded the lexicon, so this returns the copy-on-write
+    # inherited object instead of re-reading
+    global _worker_lexicon
+    ensure_dictionary(words_file, *file_names)
+    _worker_lexicon = get_dictionary(words_file)
+
+def _worker_args(words_file):
+    words_file = words_file or DEFAULT_DICTIONARY
+    return (words_file, dictionary_files(words_file))
+
+def crack_text(text, cipher, lexicon):
+    '''
+    text (string): an encrypted message
+    cipher (string): 'caesar' or 'vowel'
+    lexicon (Lexicon): the valid words
+
+    Returns: a tuple of the best decryption key and the decrypted text
+    '''
+    candidates = [(key, cipher_table(cipher, key)) for key in candidate_keys(cipher)]
+    key = progressive_search(iter_tokens(text), candidates, lexicon)[0]
+    return (key, apply_table(text, cipher_table(cipher, key)))
+
+def _crack_chunk(start, texts, cipher):
+    return [(start + offset,) + crack_text(text, cipher, _worker_lexicon)
+            for offset, text in enumerate(texts)]
+
+def _chunked(texts, chunk_size):
+    chunk = []
+    start = 0
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == chunk_size:
+            yield start, chunk
+            start += chunk_size
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+class BatchStats(object):
+    '''
+    Running throughput of a batch job, passed to the report callback of
+    crack_batch after every finished chunk.
+    '''
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.messages = 0
+        self.chunks = 0
+
+    def elapsed(self):
+        '''
+        Returns: seconds (float) since the batch started
+        '''
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        '''
+        Returns: messages cracked per second (float) so far
+        '''
+        elapsed = self.elapsed()
+        return self.messages / elapsed if elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return '%d messages in %.2fs (%.1f msg/s)' % (self.messages, self.elapsed(), self.rate())
+
+def crack_batch(texts, cipher='caesar', workers=None, chunk_size=BATCH_CHUNK_SIZE,
+                ordered=True, words_file=WORDLIST_FILENAME, max_pending=None, report=None):
+    '''
+    Cracks many ciphertexts on a pool of worker processes.
+
+    texts (iterable of strings): the encrypted messages. It is consumed
+    lazily, so it can be a generator over a file of any size.
+    cipher (string): 'caesar' or 'vowel'
+    workers (integer): number of processes, defaults to the number of CPUs
+    chunk_size (integer): ciphertexts sent to a worker per task
+    ordered (boolean): if True, results come out in input order; otherwise
+    each chunk is yielded as soon as it is done
+    words_file (string): the word list or dictionary name (see
+    lexicon.get_dictionary), loaded once per worker
+    max_pending (integer): tasks in flight at once, defaults to 4 per worker,
+    which bounds memory however long texts is
+    report (function): called with a BatchStats after every finished chunk
+
+    Returns: a generator of (index, key, decrypted text) tuples, where index
+    is the position of the ciphertext in texts
+    '''
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    stats = BatchStats()
+
+    if multiprocessing.get_start_method() == 'fork':
+        # load once in the parent so every forked worker shares the pages
+        get_dictionary(words_file)
+
+    chunks = _chunked(texts, chunk_size)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=_worker_args(words_file)) as pool:
+        pending = deque()
+
+        def submit_more():
+            while len(pending) < max_pending:
+                try:
+                    start, chunk = next(chunks)
+                except StopIteration:
+                    return
+                pending.append(pool.submit(_crack_chunk, start, chunk, cipher))
+
+        def finished(results):
+            stats.messages += len(results)
+            stats.chunks += 1
+            if report is not None:
+                report(stats)
+            return results
+
+        submit_more()
+        while pending:
+            if ordered:
+                results = pending.popleft().result()
+            else:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+                results = future.result()
+            submit_more()
+            yield from finished(results)
+
+def read_ciphertexts(path, jsonl=None):
+    '''
+    path (string): a file with one ciphertext per line
+    jsonl (boolean): if True, every line is a JSON string or an object with
+    a "text" field; if None, decided from a .jsonl or .json extension
+
+    Returns: a generator of ciphertexts (strings), read line by line
+    '''
+    if jsonl is None:
+        jsonl = path.endswith(('.jsonl', '.json'))
+    with open(path, 'r') as infile:
+        for line in infile:
+            if jsonl:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield record['text'] if isinstance(record, dict) else record
+            else:
+                yield line.rstrip('\r\n')
+
+
+def shard_bounds(text, shards):
+    '''
+    text (string): the text to split
+    shards (integer): the number of pieces wanted
+
+    Returns: a list of (start, end) offsets covering text, cut only at
+    whitespace so that no word is split between two shards
+    '''
+    bounds = []
+    start = 0
+    for shard in range(1, shards):
+        match = WHITESPACE.search(text, max(start, len(text) * shard // shards))
+        if match is None:
+            break
+        bounds.append((start, match.start()))
+        start = match.start()
+    bounds.append((start, len(text)))
+    return bounds
+
+def _count_shard(shard, cipher, keys, lexicon=None):
+    if isinstance(shard, tuple):
+        start, end = shard
+        shard = _shared_text[start:end]
+    bag = token_bag(shard)
+    lexicon = lexicon or _worker_lexicon
+    return {key: score_bag(bag, key, cipher_table(cipher, key), lexicon) for key in keys}
+
+def count_keys_parallel(text, cipher, keys=None, workers=None, shards=None, key_groups=1,
+                        use_processes=True, words_file=WORDLIST_FILENAME):
+    '''
+    Counts, for every candidate key, how many words of text are valid once
+    decrypted with that key, spreading the work over a pool.
+
+    The text is cut into shards at whitespace and the keys into key_groups
+    groups; every (shard, key group) pair is one task and the per-key counts
+    of all shards are added up at the end.
+
+    text (string): the encrypted text
+    cipher (string): 'caesar' or 'vowel'
+    keys (list): candidate decryption keys, defaults to candidate_keys(cipher)
+    workers (integer): pool size, defaults to the number of CPUs
+    shards (integer): number of text shards, defaults to workers
+    key_groups (integer): number of groups the keys are split into
+    use_processes (boolean): use a process pool (True) or a thread pool.
+    Scoring is pure Python, so only processes scale past one core on a
+    regular interpreter.
+    words_file (string): the word list or dictionary name
+
+    Returns: a dictionary mapping each key to its number of valid words
+    '''
+    global _shared_text
+    keys = list(keys) if keys is not None else candidate_keys(cipher)
+    workers = workers or os.cpu_count() or 1
+    bounds = shard_bounds(text, shards or workers)
+    groups = [keys[index::key_groups] for index in range(key_groups)]
+    lexicon = get_dictionary(words_file)
+    totals = Counter(dict.fromkeys(keys, 0))
+
+    if not use_processes:
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(_count_shard, text[start:end], cipher, group, lexicon)
+                       for start, end in bounds for group in groups]
+            for future in futures:
+                totals.update(future.result())
+        return dict(totals)
+
+    forked = multiprocessing.get_start_method() == 'fork'
+    if forked:
+        # forked workers read their shard from the inherited text, so the
+        # text is never pickled
+        _shared_text = text
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=_worker_args(words_file)) as pool:
+            futures = [pool.submit(_count_shard, (start, end) if forked else text[start:end], cipher, group)
+                       for start, end in bounds for group in groups]
+            for future in futures:
+                totals.update(future.result())
+    finally:
+        _shared_text = None
+    return dict(totals)
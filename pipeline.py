@@ -0,0 +1,183 @@
+'''
+Several cipher layers applied one after the other, e.g. a vowel
+transposition followed by a Caesar shift:
+
+    layered = Pipeline([('vowel', 'eaiuo'), ('caesar', 3)])
+    secret = layered.encrypt('Hello World!')
+    layered.decrypt(secret)                 # 'Hello World!'
+    crack_pipeline(secret, ('vowel', 'caesar'))
+
+Both ciphers map letters to letters, so any number of layers is fused into
+a single 52 letter translation table and applied in one pass over the text.
+'''
+import heapq
+import string
+from functools import lru_cache
+from itertools import product
+
+from cipher import apply_table, candidate_keys, cipher_table
+from frequency import ENGLISH_LETTER_FREQUENCIES, chi_squared, letter_histogram
+
+CONFIRM_WORDS = 200             # leading words checked against the dictionary when cracking
+CONFIRM_CANDIDATES = 10         # best frequency candidates checked against the dictionary
+CONFIRM_TOKENS = 6000           # token checks spent on those candidates, so short texts check more
+
+@lru_cache(maxsize=1024)
+def fused_table(layers, decrypt=False):
+    '''
+    layers (tuple): (cipher, key) pairs, applied in order when encrypting
+    decrypt (boolean): if True, return the table undoing all the layers
+
+    Returns: one str.translate table with the same effect as translating
+    with every layer's table in turn
+    '''
+    letters = string.ascii_letters
+    mapped = letters
+    for cipher, key in (reversed(layers) if decrypt else layers):
+        mapped = mapped.translate(cipher_table(cipher, key, decrypt))
+    return str.maketrans(letters, mapped)
+
+class Pipeline(object):
+    '''
+    An immutable sequence of (cipher, key) layers, where cipher is 'caesar'
+    or 'vowel' and key is as for cipher.cipher_table.
+    '''
+    __slots__ = ('layers',)
+
+    def __init__(self, layers=()):
+        '''
+        layers (iterable): (cipher, key) pairs, applied in order when
+        encrypting and in reverse order when decrypting
+        '''
+        self.layers = tuple((cipher, key) for cipher, key in layers)
+        # builds (and caches) the table now so bad layers fail here
+        fused_table(self.layers)
+
+    def then(self, cipher, key):
+        '''
+        Returns: a new Pipeline with the layer (cipher, key) added at the end
+        '''
+        return Pipeline(self.layers + ((cipher, key),))
+
+    def encrypt(self, text, out=None):
+        '''
+        text (string, bytes, bytearray or memoryview): the plain text
+        out (writable buffer): see cipher.apply_table
+
+        Returns: text with every layer applied, in a single pass
+        '''
+        return apply_table(text, fused_table(self.layers), out)
+
+    def decrypt(self, text, out=None):
+        '''
+        text (string, bytes, bytearray or memoryview): the encrypted text
+        out (writable buffer): see cipher.apply_table
+
+        Returns: text with every layer undone, in a single pass
+        '''
+        return apply_table(text, fused_table(self.layers, True), out)
+
+    def __eq__(self, other):
+        return isinstance(other, Pipeline) and self.layers == other.layers
+
+    def __hash__(self):
+        return hash(self.layers)
+
+    def __repr__(self):
+        return 'Pipeline(%r)' % (list(self.layers),)
+
+def _undo_positions(cipher, key):
+    # the letter (0-25) each lowercase letter becomes when the layer is undone
+    undone = string.ascii_lowercase.translate(cipher_table(cipher, key, True))
+    return [ord(letter) - ord('a') for letter in undone]
+
+def _move(histogram, positions):
+    moved = [0] * 26
+    for count, position in zip(histogram, positions):
+        moved[position] += count
+    return moved
+
+def rank_keys(histogram, ciphers, k=CONFIRM_CANDIDATES, expected=ENGLISH_LETTER_FREQUENCIES):
+    '''
+    histogram (list): the 26 letter counts of the encrypted text
+    ciphers (sequence): the cipher of every layer, in encryption order
+    k (integer): the number of key combinations wanted
+
+    Scores every combination of candidate keys (see cipher.candidate_keys)
+    by chi-squared against English letter frequencies. Only the histogram
+    is moved around, one layer at a time, so the cost does not depend on the
+    length of the text; the histogram undone by the last layer's key is
+    shared by all the combinations below it.
+
+    Returns: a list of the k best (keys, score) pairs, lowest score first,
+    where keys is a tuple of one encryption key per layer
+    '''
+    ciphers = tuple(ciphers)
+    keys = [candidate_keys(cipher) for cipher in ciphers]
+    positions = [{key: _undo_positions(cipher, key) for key in layer_keys}
+                 for cipher, layer_keys in zip(ciphers, keys)]
+
+    def scores(depth, partial, chosen):
+        # undo the layers from the last one down to the first
+        if depth < 0:
+            yield chosen, chi_squared(partial, expected)
+            return
+        for key in keys[depth]:
+            yield from scores(depth - 1, _move(partial, positions[depth][key]), (key,) + chosen)
+
+    # candidates are generated last layer first, so put them back into
+    # product order for tie breaking
+    order = {combination: index for index, combination in enumerate(product(*keys))}
+    ranked = heapq.nsmallest(k, ((score, order[combination], combination)
+                                 for combination, score in scores(len(ciphers) - 1, list(histogram), ())))
+    return [(combination, score) for score, index, combination in ranked]
+
+def crack_pipeline(text, ciphers=('vowel', 'caesar'), lexicon=None,
+                   confirm_words=CONFIRM_WORDS, confirm_candidates=CONFIRM_CANDIDATES,
+                   confirm_tokens=CONFIRM_TOKENS):
+    '''
+    Finds the keys of a text encrypted by layers of known ciphers, e.g.
+    a vowel transposition then a Caesar shift (25 x 120 key combinations).
+
+    text (string): the encrypted text
+    ciphers (sequence): the cipher of every layer, in encryption order
+    lexicon (Lexicon): the valid words, the shared one by default
+    confirm_words (integer): how many leading words are checked against the
+    dictionary; 0 trusts letter frequencies alone
+    confirm_candidates (integer): how many of the best frequency candidates
+    are at least checked against the dictionary
+    confirm_tokens (integer): how many token checks confirming may spend;
+    texts with few distinct words check more candidates, up to all of them
+
+    The text is read once for its letter histogram and every combination is
+    scored on that histogram (see rank_keys). Only the best few are then
+    tried on actual words, and the one making the most valid words wins,
+    ties going to the better frequency score. Letter frequencies of a
+    short text are too noisy to rank the right keys near the top, so the
+    fewer distinct words there are to check, the more candidates are tried.
+
+    Returns: a tuple of the Pipeline that was found and the decrypted text
+    '''
+    ciphers = tuple(ciphers)
+    if confirm_words > 0:
+        from scoring import score_bag, token_bag
+        bag = token_bag(text.split(None, confirm_words)[:confirm_words])
+        confirm_candidates = max(confirm_candidates, confirm_tokens // max(1, len(bag)))
+    ranked = rank_keys(letter_histogram(text), ciphers, max(1, confirm_candidates))
+    best = ranked[0][0]
+
+    if confirm_words > 0 and len(ranked) > 1:
+        if lexicon is None:
+            from lexicon import get_lexicon
+            lexicon = get_lexicon()
+        highestvalue = -1
+        for combination, score in ranked:
+            layers = tuple(zip(ciphers, combination))
+            # each combination is confirmed once, so caching its tokens would
+            # only push the crackers' per-key groups out of the shared cache
+            numofwords = score_bag(bag, layers, fused_table(layers, True), lexicon, cache=None)
+            if numofwords > highestvalue:
+                best, highestvalue = combination, numofwords
+
+    found = Pipeline(zip(ciphers, best))
+    return (found, found.decrypt(text))
@@ -1,25 +1,156 @@
 
-def get_permutations(sequence):
+from math import factorial
+
+def _keys(sequence, unique):
+    # every character is represented by an index into sequence; with unique,
+    # equal characters share the index of their first occurrence so that
+    # arrangements differing only in equal characters are the same
+    if unique:
+        return [sequence.index(char) for char in sequence]
+    return list(range(len(sequence)))
+
+def _multinomial(counts):
+    # number of distinct arrangements of a multiset given its counts
+    result = factorial(sum(counts.values()))
+    for count in counts.values():
+        result //= factorial(count)
+    return result
+
+def _counts(keys):
+    counts = {}
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def iter_permutations(sequence, unique=False):
+    '''
+    sequence (string): an arbitrary string to permute
+
+    unique (boolean): if True, permutations that only differ by swapping
+    repeated characters are generated once
+
+    Returns: a generator of all permutations of sequence, in lexicographic
+    order of the positions of the characters in sequence. Uses the iterative
+    next-permutation algorithm, so only the current permutation is kept in
+    memory and there is no recursion.
+
+    Example:
+    >>> list(iter_permutations('aab', unique=True))
+    ['aab', 'aba', 'baa']
+    '''
+    keys = sorted(_keys(sequence, unique))
+    last = len(keys) - 1
+    while True:
+        yield ''.join([sequence[key] for key in keys])
+
+        # find the rightmost position that is smaller than its successor
+        i = last - 1
+        while i >= 0 and keys[i] >= keys[i+1]:
+            i -= 1
+        if i < 0:
+            return
+
+        # swap it with the rightmost larger key and reverse the tail
+        j = last
+        while keys[j] <= keys[i]:
+            j -= 1
+        keys[i], keys[j] = keys[j], keys[i]
+        keys[i+1:] = keys[i+1:][::-1]
+
+def count_permutations(sequence, unique=False):
+    '''
+    sequence (string): an arbitrary string
+
+    unique (boolean): if True, count distinct permutations only
+
+    Returns: the number of permutations iter_permutations would generate,
+    computed without enumerating them
+    '''
+    if not unique:
+        return factorial(len(sequence))
+    return _multinomial(_counts(sequence))
+
+def permutation_at(sequence, index, unique=False):
+    '''
+    sequence (string): an arbitrary string
+    index (integer): 0 <= index < count_permutations(sequence, unique)
+
+    unique (boolean): as in iter_permutations
+
+    Returns: the permutation at position index of iter_permutations, without
+    generating the ones before it. Lets a range of indexes be handed to each
+    worker when splitting the work.
+    '''
+    counts = _counts(_keys(sequence, unique))
+    if not 0 <= index < _multinomial(counts):
+        raise IndexError('permutation index out of range')
+
+    result = []
+    for position in range(len(sequence)):
+        for key in sorted(counts):
+            counts[key] -= 1
+            block = _multinomial(counts)
+            if index < block:
+                result.append(sequence[key])
+                if counts[key] == 0:
+                    del counts[key]
+                break
+            index -= block
+            counts[key] += 1
+    return ''.join(result)
+
+def permutation_index(sequence, permutation, unique=False):
+    '''
+    sequence (string): an arbitrary string
+    permutation (string): a permutation of sequence
+
+    unique (boolean): as in iter_permutations
+
+    Returns: the position of permutation in iter_permutations(sequence,
+    unique), the inverse of permutation_at. Without unique, repeated
+    characters are matched to their occurrences in sequence from left to
+    right, which gives the first matching position.
+    '''
+    if sorted(permutation) != sorted(sequence):
+        raise ValueError('%r is not a permutation of %r' % (permutation, sequence))
+
+    # turn the characters of permutation back into keys
+    positions = {}
+    for key in _keys(sequence, unique):
+        positions.setdefault(sequence[key], []).append(key)
+    for char in positions:
+        positions[char].reverse()
+    keys = [positions[char].pop() for char in permutation]
+
+    counts = _counts(keys)
+    index = 0
+    for key in keys:
+        for smaller in sorted(counts):
+            if smaller >= key:
+                break
+            counts[smaller] -= 1
+            index += _multinomial(counts)
+            counts[smaller] += 1
+        counts[key] -= 1
+        if counts[key] == 0:
+            del counts[key]
+    return index
+
+def get_permutations(sequence, unique=False):
     '''
     sequence (string): an arbitrary string to permute. Assume that it is a
     non-empty string.  
 
+    unique (boolean): if True, leave out permutations that are repeated
+    because sequence contains repeated characters
+
     Returns: a list of all permutations of sequence
 
     Example:
     >>> get_permutations('abc')
     ['abc', 'acb', 'bac', 'bca', 'cab', 'cba']
     '''
-
-    if len(sequence) == 1: 
-        return [sequence]
-    else: 
-        result = []
-        perms = get_permutations(sequence[1:])
-        for perm in perms:
-            for i in range(len(perm)+1):
-                result.append(perm[:i] + sequence[0] + perm[i:])
-        return result
+    return list(iter_permutations(sequence, unique))
 
             
 
@@ -1,42 +1,9 @@
 import string
-
-def load_words(file_name):
-    '''
-    file_name (string): the name of the file containing 
-    the list of words to load    
-    
-    Returns: a list of valid words. Words are strings of lowercase letters.
-    
-    Depending on the size of the word list, this function may
-    take a while to finish.
-    '''
-    # inFile: file
-    inFile = open(file_name, 'r')
-    # wordlist: list of strings
-    wordlist = []
-    for line in inFile:
-        wordlist.extend([word.lower() for word in line.split(' ')])
-    return wordlist
-
-def is_word(word_list, word):
-    '''
-    Determines if word is a valid word, ignoring
-    capitalization and punctuation
-
-    word_list (list): list of words in the dictionary.
-    word (string): a possible word.
-    
-    Returns: True if word is in word_list, False otherwise
-
-    Example:
-    >>> is_word(word_list, 'bat') returns
-    True
-    >>> is_word(word_list, 'asdf') returns
-    False
-    '''
-    word = word.lower()
-    word = word.strip(" !@#$%^&*()-_+={}[]|\:;'<>?,./\"")
-    return word in word_list
+import metrics
+from cipher import apply_table, candidate_keys, shift_table
+from frequency import rank_shifts
+from lexicon import WORDLIST_FILENAME, get_dictionary, is_word, load_words
+from scoring import DELTA, GROWTH, INITIAL_SAMPLE, iter_tokens, progressive_search, score_bag, token_bag, top_keys
 
 def get_story_string():
     """
@@ -48,11 +15,16 @@ def get_story_string():
     return story
 
 
-WORDLIST_FILENAME = 'words.txt'
-
 # The code above this line had been provided by MIT
 
 class Message(object):
+    # messages are created by the million in batches and queues, so they
+    # have no __dict__ and look the shared lexicon up instead of keeping a
+    # reference each
+    __slots__ = ('_message_text',)
+    lexicon_file = WORDLIST_FILENAME
+    dictionary = None           # a dictionary name, see lexicon.get_dictionary
+
     def __init__(self, text):
         '''
         Initializes a Message object
@@ -61,10 +33,28 @@ class Message(object):
 
         a Message object has two attributes:
             self.message_text (string, determined by input text)
-            self.valid_words (list, determined using helper function load_words)
+            self.valid_words (Lexicon, shared by every message, see get_lexicon;
+            only loaded when first used)
         '''
         self.message_text = text
-        self.valid_words = load_words(WORDLIST_FILENAME)
+
+    @property
+    def message_text(self):
+        return self._message_text
+
+    @message_text.setter
+    def message_text(self, text):
+        self._message_text = text
+        self._invalidate()
+
+    @property
+    def valid_words(self):
+        return get_dictionary(self.dictionary or self.lexicon_file)
+
+    def _invalidate(self):
+        # called whenever the text changes; subclasses drop anything they
+        # derived from it
+        pass
 
     def get_message_text(self):
         '''
@@ -76,9 +66,9 @@ class Message(object):
     def get_valid_words(self):
         '''
         Used to safely access a copy of self.valid_words outside of the class.
-        Returns: a COPY of self.valid_words
+        Returns: a COPY of self.valid_words, as a list
         '''
-        words = self.valid_words.copy()
+        words = list(self.valid_words)
         return words
 
     def build_shift_dict(self, shift):
@@ -110,7 +100,7 @@ class Message(object):
         
         return alphadict
 
-    def apply_shift(self, shift):
+    def apply_shift(self, shift, out=None):
         '''
         Applies the Caesar Cipher to self.message_text with the input shift.
         Creates a new string that is self.message_text shifted down the
@@ -118,25 +108,22 @@ class Message(object):
         
         shift (integer): the shift with which to encrypt the message.
         0 <= shift < 26
+        out (writable buffer): only if self.message_text is bytes, bytearray
+        or memoryview; the result is written into out (which may be the
+        message buffer itself) instead of a new object
 
         Returns: the message text (string) in which every character is shifted
-             down the alphabet by the input shift
-        '''
-        mappingdict = self.build_shift_dict(shift)
-        newstring = ''
-
-        # goes through the message_text's indexes in ascending order
-        # if that position of the string is a letter, add the corresponding value associated with that letter in the mappingdict 
-        for letter in self.message_text:
-            if letter in string.ascii_letters:
-                newstring += mappingdict[letter]
-            else:
-                newstring += letter
-        
-        return newstring
+             down the alphabet by the input shift. For byte messages, ASCII
+             letters are shifted and every other byte is left as it is.
+        '''
+        # the translation table is built once per shift and cached, so this is a
+        # single linear pass over the text instead of repeated string concatenation
+        return apply_table(self.message_text, shift_table(shift), out)
 
 
 class PlaintextMessage(Message):
+    __slots__ = ('_shift', '_encryption_dict', '_message_text_encrypted')
+
     def __init__(self, text, shift):
         '''
         Initializes a PlaintextMessage object        
@@ -146,17 +133,40 @@ class PlaintextMessage(Message):
 
         A PlaintextMessage object inherits from Message and has five attributes:
             self.message_text (string, determined by input text)
-            self.valid_words (list, determined using helper function load_words)
+            self.valid_words (Lexicon, shared by every message, see get_lexicon)
             self.shift (integer, determined by input shift)
             self.encryption_dict (dictionary, built using shift)
             self.message_text_encrypted (string, created using shift)
 
+        encryption_dict and message_text_encrypted are only computed when
+        first used, and computed again after the text or shift changes.
         '''
+        self._shift = shift
+        self._encryption_dict = None
         self.message_text = text
-        self.valid_words = load_words(WORDLIST_FILENAME)
-        self.shift = shift
-        self.encryption_dict = super().build_shift_dict(shift)
-        self.message_text_encrypted = super().apply_shift(shift)
+
+    @property
+    def shift(self):
+        return self._shift
+
+    @shift.setter
+    def shift(self, shift):
+        self.change_shift(shift)
+
+    @property
+    def encryption_dict(self):
+        if self._encryption_dict is None:
+            self._encryption_dict = self.build_shift_dict(self._shift)
+        return self._encryption_dict
+
+    @property
+    def message_text_encrypted(self):
+        if self._message_text_encrypted is None:
+            self._message_text_encrypted = self.apply_shift(self._shift)
+        return self._message_text_encrypted
+
+    def _invalidate(self):
+        self._message_text_encrypted = None
 
     def get_shift(self):
         '''
@@ -193,15 +203,58 @@ class PlaintextMessage(Message):
 
         Returns: nothing
         '''        
-        self.shift = shift
-        self.encryption_dict = super().build_shift_dict(shift)
-        self.message_text_encrypted = super().apply_shift(shift)
+        # shifting the current ciphertext by the difference gives the same
+        # result as encrypting the plaintext again with the new shift
+        if self._message_text_encrypted is not None:
+            self._message_text_encrypted = apply_table(self._message_text_encrypted,
+                                                       shift_table(shift - self._shift))
+        self._shift = shift
+        self._encryption_dict = None
+
+    def append(self, text):
+        '''
+        Adds text to the end of the message, encrypting only text.
 
-        
+        text (string, or bytes for byte messages): the text to add. A
+        bytearray message is extended in place.
+
+        Returns: nothing
+        '''
+        self._message_text += text
+        if self._message_text_encrypted is not None:
+            self._message_text_encrypted += apply_table(text, shift_table(self._shift))
+
+    def splice(self, start, stop, text):
+        '''
+        Replaces self.message_text[start:stop] with text, encrypting only
+        text. Both ciphers map one character to one character, so the same
+        range of the ciphertext is replaced.
+
+        start, stop (integers): the range to replace, as in a slice
+        text (string, or bytes for byte messages): the replacement, of any
+        length; an empty text deletes the range
+
+        Returns: nothing
+        '''
+        self._message_text = _splice(self._message_text, start, stop, text)
+        if self._message_text_encrypted is not None:
+            self._message_text_encrypted = _splice(self._message_text_encrypted, start, stop,
+                                                   apply_table(text, shift_table(self._shift)))
+
+
+def _splice(sequence, start, stop, replacement):
+    # bytearrays are edited in place, immutable texts are rebuilt
+    if isinstance(sequence, bytearray):
+        sequence[start:stop] = replacement
+        return sequence
+    start, stop, step = slice(start, stop).indices(len(sequence))
+    return sequence[:start] + replacement + sequence[max(start, stop):]
 
 
 class CiphertextMessage(Message):
-    def __init__(self, text):
+    __slots__ = ('dictionary',)
+
+    def __init__(self, text, dictionary=None):
         '''
         Initializes a CiphertextMessage object
                 
@@ -209,12 +262,17 @@ class CiphertextMessage(Message):
 
         a CiphertextMessage object has two attributes:
             self.message_text (string, determined by input text)
-            self.valid_words (list, determined using helper function load_words)
+            self.valid_words (Lexicon, shared by every message, see get_lexicon)
+
+        dictionary (string): the name of the dictionary (see
+        lexicon.register_dictionary) or word list to crack with, words.txt
+        if None
         '''
         self.message_text = text
-        self.valid_words = load_words("words.txt")
+        self.dictionary = dictionary
 
-    def decrypt_message(self):
+    @metrics.timed('caesar.decrypt_message')
+    def decrypt_message(self, workers=None):
         '''
         Decrypt self.message_text by trying every possible shift value
         and find the "best" one. We will define "best" as the shift that
@@ -227,30 +285,100 @@ class CiphertextMessage(Message):
         the maximum number of valid words, we add them to a list and choose the 
         shift at position 0
 
+        workers (integer): if given, the shifts are scored on a pool of that
+        many processes, each counting words on a shard of the text. Worth it
+        for very large messages only.
+
         Returns: a tuple of the best shift value used to decrypt the message
         and the decrypted message text using that shift value
         '''
-        wordcount_dict = {}     # stores shift values as keys and the number of valid words generated by applying that shift value to the text as values
-
-        # applies all possible shift values to the message text
-        # checks how many valid words are generated by applying those shift values and stores that in wordcount_dict as wordcount_dict[shift value] = words generated
-        for i in range(1,26):
-            decryptedstring = super().apply_shift(26-i)
-            listofwords = decryptedstring.split(' ')
-            for word in listofwords:
-                if is_word(self.valid_words, word): 
-                    wordcount_dict[26-i] = wordcount_dict.get(26-i,0) + 1
-
-        # finds the shift value that generates the highest number of words
-        highestvalue = 0 
-        for value in wordcount_dict.values():
-            if value > highestvalue:
-                highestvalue = value
-        bestshiftvalue = [shiftval for shiftval,numofwords in wordcount_dict.items() if numofwords == highestvalue][0]
-        
-        decryptedtext = super().apply_shift(bestshiftvalue)
-
+        bestshiftvalue, numofwords, decryptedtext = self.rank_decryptions(1, workers)[0]
         return (bestshiftvalue, decryptedtext)
+
+    @metrics.timed('caesar.rank_decryptions')
+    def rank_decryptions(self, k=5, workers=None):
+        '''
+        Scores every shift value like decrypt_message and keeps the k best,
+        so near-ties can be inspected.
+
+        k (integer): the number of shift values wanted
+        workers (integer): as in decrypt_message
+
+        Returns: a list of up to k (shift value, number of valid words,
+        decrypted text) tuples, best first. Equal scores are in the order
+        decrypt_message prefers them, so the first tuple is its answer. Only
+        the returned shift values are applied to the text, once each.
+        '''
+        shiftvalues = candidate_keys('caesar')
+        if workers:
+            # process pools are slow to import and rarely used
+            from parallel import count_keys_parallel
+            counts = count_keys_parallel(self.message_text, 'caesar', shiftvalues, workers=workers,
+                                         words_file=self.dictionary or self.lexicon_file)
+            scores = ((shiftval, counts.get(shiftval, 0)) for shiftval in shiftvalues)
+        else:
+            # the text is split into a bag of distinct words once; every shift value is then
+            # scored on the distinct words only, with results memoized across messages
+            bag = token_bag(self.message_text)
+            valid_words = self.valid_words
+            scores = ((shiftval, score_bag(bag, shiftval, shift_table(shiftval), valid_words))
+                      for shiftval in shiftvalues)
+
+        return [(shiftval, numofwords, self.apply_shift(shiftval))
+                for shiftval, numofwords in top_keys(scores, k)]
+
+    @metrics.timed('caesar.decrypt_message_frequency')
+    def decrypt_message_frequency(self, confirm_words=50, confirm_shifts=3):
+        '''
+        Decrypt self.message_text using letter frequencies instead of trying
+        every shift against the dictionary. A single letter histogram of the
+        text is rotated through all 26 shifts and each rotation is scored by
+        chi-squared against English letter frequencies.
+
+        confirm_words (integer): if positive, the first confirm_words words
+        are checked against the dictionary for the confirm_shifts best shifts
+        and the shift with the most valid words wins (ties go to the better
+        frequency score). 0 trusts the frequency score alone.
+        confirm_shifts (integer): how many of the best shifts to confirm
+
+        Returns: a tuple of the best shift value used to decrypt the message
+        and the decrypted message text using that shift value
+        '''
+        ranked = rank_shifts(self.message_text)
+        bestshiftvalue = ranked[0]
+
+        if confirm_words > 0:
+            sample = self.message_text.split(None, confirm_words)[:confirm_words]
+            highestvalue = -1
+            valid_words = self.valid_words
+            for shift in ranked[:confirm_shifts]:
+                table = shift_table(shift)
+                numofwords = sum(1 for word in sample if is_word(valid_words, word.translate(table)))
+                if numofwords > highestvalue:
+                    bestshiftvalue, highestvalue = shift, numofwords
+
+        return (bestshiftvalue, self.apply_shift(bestshiftvalue))
+
+    @metrics.timed('caesar.decrypt_message_progressive')
+    def decrypt_message_progressive(self, initial_sample=INITIAL_SAMPLE, growth=GROWTH, delta=DELTA):
+        '''
+        Decrypt self.message_text like decrypt_message, but score the shifts
+        on a growing sample of words and drop shifts that are clearly worse
+        than the leader, stopping once a single shift is left. Long messages
+        usually only need a few hundred words to be scored.
+
+        initial_sample (integer): number of words scored in the first round
+        growth (number): factor by which the sample grows every round
+        delta (float): probability of wrongly dropping the best shift
+
+        Returns: a tuple of the best shift value, the decrypted message text
+        using that shift value and the confidence (float between 0 and 1)
+        that the shift beats every other shift
+        '''
+        candidates = [(shift, shift_table(shift)) for shift in candidate_keys('caesar')]
+        bestshiftvalue, confidence = progressive_search(iter_tokens(self.message_text), candidates,
+                                                        self.valid_words, initial_sample, growth, delta)
+        return (bestshiftvalue, self.apply_shift(bestshiftvalue), confidence)
     
 
 if __name__ == '__main__':
@@ -1,47 +1,10 @@
 import string
+import metrics
 from ps4a import get_permutations
-
-def load_words(file_name):
-    '''
-    file_name (string): the name of the file containing 
-    the list of words to load    
-    
-    Returns: a list of valid words. Words are strings of lowercase letters.
-    
-    Depending on the size of the word list, this function may
-    take a while to finish.
-    '''
-    
-    # inFile: file
-    inFile = open(file_name, 'r')
-    # wordlist: list of strings
-    wordlist = []
-    for line in inFile:
-        wordlist.extend([word.lower() for word in line.split(' ')])
-    return wordlist
-
-def is_word(word_list, word):
-    '''
-    Determines if word is a valid word, ignoring
-    capitalization and punctuation
-
-    word_list (list): list of words in the dictionary.
-    word (string): a possible word.
-    
-    Returns: True if word is in word_list, False otherwise
-
-    Example:
-    >>> is_word(word_list, 'bat') returns
-    True
-    >>> is_word(word_list, 'asdf') returns
-    False
-    '''
-    word = word.lower()
-    word = word.strip(" !@#$%^&*()-_+={}[]|\:;'<>?,./\"")
-    return word in word_list
-
-
-WORDLIST_FILENAME = 'words.txt'
+from cipher import apply_table, candidate_keys, table_from_dict, transpose_table
+from lexicon import WORDLIST_FILENAME, get_dictionary, is_word, load_words
+from scoring import DELTA, GROWTH, INITIAL_SAMPLE, iter_tokens, progressive_search, score_bag, token_bag, top_keys
+from substitution import solve_substitution
 
 VOWELS_LOWER = 'aeiou'
 VOWELS_UPPER = 'AEIOU'
@@ -51,6 +14,12 @@ CONSONANTS_UPPER = 'BCDFGHJKLMNPQRSTVWXYZ'
 # The code above this line had been provided by MIT
 
 class SubMessage(object):
+    # no __dict__, and the shared lexicon is looked up rather than referenced
+    # by every message, see ps4b.Message
+    __slots__ = ('message_text',)
+    lexicon_file = WORDLIST_FILENAME
+    dictionary = None           # a dictionary name, see lexicon.get_dictionary
+
     def __init__(self, text):
         '''
         Initializes a SubMessage object
@@ -59,10 +28,14 @@ class SubMessage(object):
 
         A SubMessage object has two attributes:
             self.message_text (string, determined by input text)
-            self.valid_words (list, determined using helper function load_words)
+            self.valid_words (Lexicon, shared by every message, see get_lexicon;
+            only loaded when first used)
         '''
         self.message_text = text 
-        self.valid_words = load_words(WORDLIST_FILENAME)
+
+    @property
+    def valid_words(self):
+        return get_dictionary(self.dictionary or self.lexicon_file)
     
     def get_message_text(self):
         '''
@@ -77,9 +50,9 @@ class SubMessage(object):
         Used to safely access a copy of self.valid_words outside of the class.
         This helps you avoid accidentally mutating class attributes.
         
-        Returns: a COPY of self.valid_words
+        Returns: a COPY of self.valid_words, as a list
         '''
-        words = self.valid_words.copy()
+        words = list(self.valid_words)
         return words
                 
     def build_transpose_dict(self, vowels_permutation):
@@ -112,28 +85,27 @@ class SubMessage(object):
         return vowel_dict
 
     
-    def apply_transpose(self, transpose_dict):
+    def apply_transpose(self, transpose_dict, out=None):
         '''
         transpose_dict (dict): a transpose dictionary
+        out (writable buffer): only if the message text is bytes, bytearray
+        or memoryview; the result is written into out (which may be the
+        message buffer itself) instead of a new object
         
         Returns: an encrypted version of the message text, based 
-        on the dictionary
+        on the dictionary. For byte messages, ASCII vowels are transposed
+        and every other byte is left as it is.
         '''
-        words = self.get_message_text()
-
-        # if the letter is a vowel, replace it with the corresponding value associated with that vowel in the given dict    
-        for index in range(len(words)):
-            if words[index] in VOWELS_LOWER or words[index] in VOWELS_UPPER:
-                words = words[:index] + transpose_dict[words[index]] + words[index+1:]
-            else:
-                continue
-                    
-        return words
+        # the dictionary is turned into a cached translation table, so the
+        # whole text is transposed in one linear pass
+        return apply_table(self.get_message_text(), table_from_dict(transpose_dict), out)
 
 
         
 class EncryptedSubMessage(SubMessage):
-    def __init__(self, text):
+    __slots__ = ('dictionary',)
+
+    def __init__(self, text, dictionary=None):
         '''
         Initializes an EncryptedSubMessage object
 
@@ -141,11 +113,17 @@ class EncryptedSubMessage(SubMessage):
 
         An EncryptedSubMessage object inherits from SubMessage and has two attributes:
             self.message_text (string, determined by input text)
-            self.valid_words (list, determined using helper function load_words)
+            self.valid_words (Lexicon, shared by every message, see get_lexicon)
+
+        dictionary (string): the name of the dictionary (see
+        lexicon.register_dictionary) or word list to crack with, words.txt
+        if None
         '''
         SubMessage.__init__(self,text)
+        self.dictionary = dictionary
 
-    def decrypt_message(self):
+    @metrics.timed('vowel.decrypt_message')
+    def decrypt_message(self, workers=None):
         '''
         Attempt to decrypt the encrypted message 
         
@@ -159,36 +137,96 @@ class EncryptedSubMessage(SubMessage):
         multiple permutations that yield the maximum number of words, return any
         one of them.
 
+        workers (integer): if given, the permutations are scored on a pool of
+        that many processes, each counting words on a shard of the text.
+        Worth it for very large messages only.
+
         Returns: the best decrypted message    
         
         Hint: use your function from Part 4A
         '''
 
-        permsofvowels = get_permutations('aeiou')
-        wordcount_dict = {}                        # stores permutations as keys and the number of valid words generated by applying that permutation to the text as values
-        
-        for i in permsofvowels:
-            dict = super().build_transpose_dict(i)
-            permappliedtext = super().apply_transpose(dict)
-            words = permappliedtext.split()
-            for word in words:
-                if is_word(self.valid_words, word):
-                    wordcount_dict[i] = wordcount_dict.get(i,0) + 1
-            
-        highestvalue = 0 
-        for value in wordcount_dict.values():
-            if value > highestvalue:
-                highestvalue = value
-
-        if highestvalue > 0:
-            bestperm = [shiftval for shiftval,numofwords in wordcount_dict.items() if numofwords == highestvalue][0]
-            
-            finaldict = super().build_transpose_dict(bestperm)
-            finaltext = super().apply_transpose(finaldict)
+        bestperm, numofwords, finaltext = self.rank_decryptions(1, workers)[0]
+        if numofwords > 0:
             return finaltext
+        else:
+            return self.message_text
+
+    @metrics.timed('vowel.rank_decryptions')
+    def rank_decryptions(self, k=5, workers=None):
+        '''
+        Scores every permutation of the vowels like decrypt_message and
+        keeps the k best, so near-ties can be inspected.
+
+        k (integer): the number of permutations wanted
+        workers (integer): as in decrypt_message
 
+        Returns: a list of up to k (permutation, number of valid words,
+        decrypted text) tuples, best first. Equal scores are in the order
+        decrypt_message prefers them. Only the returned permutations are
+        applied to the text, once each.
+        '''
+        permsofvowels = get_permutations('aeiou')
+
+        if workers:
+            # process pools are slow to import and rarely used
+            from parallel import count_keys_parallel
+            counts = count_keys_parallel(self.message_text, 'vowel', permsofvowels, workers=workers,
+                                         words_file=self.dictionary or self.lexicon_file)
+            scores = ((perm, counts.get(perm, 0)) for perm in permsofvowels)
         else:
-            return self.message_text()
+            # the text is split into a bag of distinct words once; every permutation is then
+            # scored on the distinct words only, with results memoized across messages
+            bag = token_bag(self.message_text)
+            valid_words = self.valid_words
+            scores = ((perm, score_bag(bag, perm, transpose_table(perm), valid_words))
+                      for perm in permsofvowels)
+
+        return [(perm, numofwords, apply_table(self.message_text, transpose_table(perm)))
+                for perm, numofwords in top_keys(scores, k)]
+
+    @metrics.timed('vowel.decrypt_message_progressive')
+    def decrypt_message_progressive(self, initial_sample=INITIAL_SAMPLE, growth=GROWTH, delta=DELTA):
+        '''
+        Decrypt the encrypted message like decrypt_message, but score the
+        vowel permutations on a growing sample of words and drop permutations
+        that are clearly worse than the leader, stopping once a single
+        permutation is left.
+
+        initial_sample (integer): number of words scored in the first round
+        growth (number): factor by which the sample grows every round
+        delta (float): probability of wrongly dropping the best permutation
+
+        Returns: a tuple of the best permutation, the decrypted message text
+        using it and the confidence (float between 0 and 1) that it beats
+        every other permutation
+        '''
+        candidates = [(perm, transpose_table(perm)) for perm in candidate_keys('vowel')]
+        bestperm, confidence = progressive_search(iter_tokens(self.message_text), candidates,
+                                                  self.valid_words, initial_sample, growth, delta)
+        return (bestperm, apply_table(self.message_text, transpose_table(bestperm)), confidence)
+
+    @metrics.timed('vowel.decrypt_message_skeleton')
+    def decrypt_message_skeleton(self):
+        '''
+        Decrypt the encrypted message by working out each vowel separately
+        instead of trying all 120 permutations. The consonants of a word are
+        not changed by the cipher, so each distinct word is matched once
+        against the dictionary words with the same consonants, and the vowels
+        those words have in the masked positions pin down the mapping (see
+        substitution.solve_substitution). Permutations are only tried for the
+        vowels that stay ambiguous.
+
+        If no permutation results in at least 1 valid word, the original
+        string is returned.
+
+        Returns: a tuple of the best permutation and the decrypted message
+        '''
+        mapping, numofwords = solve_substitution(self.message_text, VOWELS_LOWER, self.valid_words)
+        if numofwords == 0:
+            return (VOWELS_LOWER, self.message_text)
+        bestperm = ''.join(mapping[vowel] for vowel in VOWELS_LOWER)
+        return (bestperm, apply_table(self.message_text, transpose_table(bestperm)))
 
     
 
@@ -0,0 +1,292 @@
+import heapq
+import math
+import threading
+from collections import Counter, OrderedDict
+from itertools import compress, islice
+
+import metrics
+from lexicon import PUNCTUATION
+from stream import CHUNK_SIZE, iter_words
+
+INITIAL_SAMPLE = 64             # tokens scored in the first round
+GROWTH = 2                      # each round scores this many times more tokens
+DELTA = 0.01                    # allowed chance of pruning the real key
+TOKEN_CACHE_SIZE = 1 << 18      # (token, key) results kept by the shared cache
+
+def normalize(word):
+    '''
+    word (string): a word as it appears in a text
+
+    Returns: word lowercased and stripped of punctuation, the form is_word
+    looks up
+    '''
+    return word.lower().strip(PUNCTUATION)
+
+def token_bag(words):
+    '''
+    words (string or iterable of strings): a text, or its words
+
+    Returns: a Counter mapping every distinct normalized word to the number
+    of times it occurs. Both ciphers map letters to letters case by case,
+    so scoring a key on the bag gives the same count as scoring every word.
+    '''
+    if isinstance(words, str):
+        words = words.split()
+    return Counter(map(normalize, words))
+
+def iter_tokens(text, chunk_size=CHUNK_SIZE):
+    '''
+    text (string): a text
+
+    Returns: a generator of the whitespace separated words of text, split
+    a chunk at a time, so a caller reading only the first few words never
+    splits the whole text
+    '''
+    return iter_words(text[start:start + chunk_size] for start in range(0, len(text), chunk_size))
+
+def _membership(lexicon):
+    # a C level membership test where the lexicon has one, so that bulk
+    # scoring never calls back into Python per token
+    return getattr(lexicon, 'contains', None) or lexicon.__contains__
+
+def translate_tokens(tokens, table, lexicon):
+    '''
+    tokens (list of strings): normalized encrypted words, none containing
+    a newline
+    table (dict): a translation table
+    lexicon (Lexicon): the valid words
+
+    Returns: a list of booleans, True where the translated token is a valid
+    word. All tokens are translated with a single str.translate call on
+    their newline-joined text, so the work happens at C speed.
+    '''
+    if not tokens:
+        return []
+    translated = '\n'.join(tokens).translate(table).split('\n')
+    return list(map(_membership(lexicon), translated))
+
+class TokenCache(object):
+    '''
+    A bounded cache of whether a normalized token is a valid word once
+    decrypted with a key. One instance is shared by every message, so
+    vocabulary repeated across messages is only checked once per key.
+
+    Entries are grouped per (lexicon, key). A group keeps its lexicon and is
+    only used for that very object, so a new lexicon that happens to get the
+    id of a dropped one starts afresh. Groups are evicted least
+    recently used first, and within a group the oldest tokens go first,
+    which keeps lookups free of per-token locking and bookkeeping. The
+    cache can be shared by threads: groups are only changed with the lock
+    held, and results never depend on what another thread left in them.
+    '''
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        '''
+        maxsize (integer): the most (token, key) entries kept
+        '''
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self.groups = OrderedDict()     # (id of lexicon, key) -> (lexicon, {token: valid})
+        self.lock = threading.Lock()
+
+    def lookup(self, tokens, key, table, lexicon):
+        '''
+        tokens (list of strings): normalized encrypted words
+        key (hashable): the candidate key table belongs to. Caesar keys are
+        integers and vowel keys strings, so they never collide.
+        table (dict): the translation table of key
+        lexicon (Lexicon): the valid words
+
+        Returns: a list of booleans, True where the token translated with
+        table is in lexicon. Only tokens not cached yet are translated.
+        '''
+        group_key = (id(lexicon), key)
+        with self.lock:
+            known = self._group(group_key, lexicon)
+            self.groups.move_to_end(group_key)
+
+        results = list(map(known.get, tokens))
+        missing = [token for token, valid in zip(tokens, results) if valid is None]
+        with self.lock:
+            self.hits += len(tokens) - len(missing)
+            self.misses += len(missing)
+        metrics.count('cache.hits', len(tokens) - len(missing))
+        metrics.count('cache.misses', len(missing))
+        if not missing:
+            return results
+
+        # the results come from the values just computed, never from the
+        # group, which another thread may trim or evict in the meantime
+        computed = dict(zip(missing, translate_tokens(missing, table, lexicon)))
+        results = [computed[token] if valid is None else valid for token, valid in zip(tokens, results)]
+        with self.lock:
+            known = self._group(group_key, lexicon)
+            known_before = len(known)
+            known.update(computed)
+            self.size += len(known) - known_before
+            self._evict(group_key)
+        return results
+
+    def _group(self, group_key, lexicon):
+        # the tokens cached for group_key, emptied if they were cached for
+        # another lexicon with the same id; called with the lock held
+        entry = self.groups.get(group_key)
+        if entry is None or entry[0] is not lexicon:
+            if entry is not None:
+                self.size -= len(entry[1])
+            entry = self.groups[group_key] = (lexicon, {})
+        return entry[1]
+
+    def _evict(self, current):
+        # drop whole groups, least recently used first, then trim the oldest
+        # tokens of the group in use if it alone is over the limit; called
+        # with the lock held
+        while self.size > self.maxsize and len(self.groups) > 1:
+            group_key, (lexicon, group) = next(iter(self.groups.items()))
+            if group_key == current:
+                break
+            del self.groups[group_key]
+            self.size -= len(group)
+        group = self.groups[current][1]
+        excess = self.size - self.maxsize
+        if excess > 0:
+            for token in list(islice(group, excess)):
+                del group[token]
+                self.size -= 1
+
+    def stats(self):
+        '''
+        Returns: a dictionary with the hits, misses, hit_rate, size and
+        maxsize of the cache
+        '''
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': self.size, 'maxsize': self.maxsize}
+
+    def clear(self):
+        '''
+        Empties the cache and resets its statistics.
+        '''
+        with self.lock:
+            self.groups.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+TOKEN_CACHE = TokenCache()
+
+def token_cache_stats():
+    '''
+    Returns: the statistics of the shared token cache, see TokenCache.stats
+    '''
+    return TOKEN_CACHE.stats()
+
+def score_bag(bag, key, table, lexicon, cache=TOKEN_CACHE):
+    '''
+    bag (Counter): normalized tokens and their counts, from token_bag
+    key (hashable): the candidate key, used as part of the cache key
+    table (dict): the translation table of key
+    lexicon (Lexicon): the valid words
+    cache (TokenCache): where results are memoized, None to disable
+
+    Returns: the number of words (counting repeats) that are valid once
+    translated, at a cost proportional to the number of distinct tokens
+    '''
+    tokens = list(bag)
+    with metrics.timer('candidate.transform'):
+        if cache is None:
+            valid = translate_tokens(tokens, table, lexicon)
+        else:
+            valid = cache.lookup(tokens, key, table, lexicon)
+    metrics.count('tokens.scored', len(tokens))
+    return sum(compress(bag.values(), valid))
+
+def top_keys(scores, k):
+    '''
+    scores (iterable): (key, score) pairs, in tie-break order
+    k (integer): the number of keys wanted
+
+    Returns: a list of the k (key, score) pairs with the highest scores,
+    best first; equal scores keep the order they came in. Only k pairs are
+    kept while scores is consumed, the candidates are never sorted.
+    '''
+    ranked = heapq.nlargest(k, ((score, -index, key) for index, (key, score) in enumerate(scores)))
+    return [(key, score) for score, index, key in ranked]
+
+def _confidence(gap, n, num_candidates):
+    # Hoeffding bound on two hit rates measured on the same n tokens, with a
+    # union bound over all candidates
+    if n == 0 or gap <= 0:
+        return 0.0
+    return max(0.0, 1.0 - 2 * num_candidates * math.exp(-n * gap * gap / 2))
+
+def progressive_search(tokens, candidates, lexicon, initial_sample=INITIAL_SAMPLE,
+                       growth=GROWTH, delta=DELTA):
+    '''
+    Finds the candidate key that makes the most tokens valid words without
+    necessarily scoring every token.
+
+    Candidates are scored on a leading sample of tokens that grows by growth
+    every round. After each round every candidate whose valid-word rate is
+    clearly below the leader's (its upper confidence bound is under the
+    leader's lower bound) is pruned. The search stops as soon as a single
+    candidate is left or all tokens have been scored. Tokens are read only
+    as far as the rounds need them.
+
+    tokens (iterable of strings): words of the encrypted text, e.g. from
+    iter_tokens
+    candidates (list): (key, translation table) pairs, in tie-break order
+    lexicon (Lexicon): the valid words
+    initial_sample (integer): number of tokens scored in the first round
+    growth (number): factor by which the sample grows every round
+    delta (float): probability of wrongly pruning the best key
+
+    Returns: a tuple of the best key and the confidence (float between
+    0 and 1) that it beats every other candidate
+    '''
+    if not candidates:
+        raise ValueError('no candidate keys to search')
+    num_candidates = len(candidates)
+    alive = list(candidates)
+    hits = dict.fromkeys([key for key, table in candidates], 0)
+    confidence = 1.0
+    scored = 0
+    size = max(1, initial_sample)
+    tokens = iter(tokens)
+
+    while True:
+        batch = list(islice(tokens, size - scored))
+        bag = token_bag(batch)
+        for key, table in alive:
+            hits[key] += score_bag(bag, key, table, lexicon)
+        scored += len(batch)
+
+        leader = max(alive, key=lambda candidate: hits[candidate[0]])[0]
+        if scored == 0:
+            return (leader, 0.0)
+        leader_rate = hits[leader] / scored
+        margin = math.sqrt(math.log(2 * num_candidates / delta) / (2 * scored))
+
+        survivors = []
+        for key, table in alive:
+            rate = hits[key] / scored
+            if key != leader and rate + margin < leader_rate - margin:
+                confidence = min(confidence, _confidence(leader_rate - rate, scored, num_candidates))
+            else:
+                survivors.append((key, table))
+        metrics.count('candidates.pruned', len(alive) - len(survivors))
+        alive = survivors
+
+        if len(alive) == 1 or scored < size:
+            # a short batch means the tokens ran out
+            break
+        size = int(size * growth) + 1
+
+    # candidates still alive when the tokens ran out could not be separated
+    for key, table in alive:
+        if key != leader:
+            confidence = min(confidence, _confidence(leader_rate - hits[key] / scored,
+                                                     scored, num_candidates))
+    return (leader, confidence)
@@ -0,0 +1,263 @@
+'''
+A local asyncio service for both ciphers, speaking newline-delimited JSON
+over TCP or a Unix socket. Every request is one line:
+
+    {"id": 1, "op": "encrypt", "cipher": "caesar", "key": 3, "text": "Hello"}
+    {"id": 2, "op": "decrypt", "cipher": "vowel", "key": "eaiuo", "text": "Hallu"}
+    {"id": 3, "op": "decrypt", "cipher": "caesar", "text": "Khoor"}
+    {"id": 4, "op": "decrypt", "cipher": "caesar", "text": "Khoor", "dictionary": "english"}
+
+and every response is one line with the same id:
+
+    {"id": 3, "ok": true, "key": 23, "text": "Hello"}
+    {"id": 4, "ok": false, "error": "unknown op 'sign'"}
+
+A decrypt request without a key cracks the text, with the dictionary
+named by "dictionary" if given; only names registered with
+lexicon.register_dictionary in the service process are accepted, not file
+paths (see 'cli.py serve --dictionary'). Responses on one connection may
+come back in a different order than the requests.
+'''
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from cipher import invert_vowels_permutation
+from lexicon import dictionary_files, dictionary_names, ensure_dictionary
+
+BATCH_SIZE = 64                 # requests handled per executor call
+BATCH_WINDOW = 0.002            # seconds to wait for a batch to fill up
+QUEUE_SIZE = 1024               # requests waiting for a batch before readers block
+CONNECTION_IN_FLIGHT = 128      # unanswered requests per connection before it is paused
+LINE_LIMIT = 1 << 24            # longest request line accepted, in bytes
+
+def check_dictionary(request):
+    '''
+    Raises ValueError unless the dictionary of request (dict) is absent or
+    a registered name. Clients may only pick registered dictionaries, never
+    a file on the server.
+    '''
+    dictionary = request.get('dictionary')
+    if dictionary is not None and dictionary not in dictionary_names():
+        raise ValueError('unknown dictionary %r, expected one of %s' % (dictionary, ', '.join(dictionary_names())))
+
+def handle_request(request):
+    '''
+    request (dict): a decoded request, see the module docstring
+
+    Returns: the response (dict) for request, without its id
+    '''
+    # imported here so executor processes load the message classes (and
+    # the word list) on their first request, not at start up
+    from ps4b import CiphertextMessage, PlaintextMessage
+    from ps4c import EncryptedSubMessage, SubMessage
+
+    op = request.get('op')
+    cipher = request.get('cipher', 'caesar')
+    text = request.get('text')
+    key = request.get('key')
+    dictionary = request.get('dictionary')
+    check_dictionary(request)
+    if not isinstance(text, str):
+        raise ValueError('text must be a string')
+    if op not in ('encrypt', 'decrypt'):
+        raise ValueError('unknown op %r' % (op,))
+    if op == 'encrypt' and key is None:
+        raise ValueError('encrypt needs a key')
+
+    if cipher == 'caesar':
+        if key is None:
+            key, text = CiphertextMessage(text, dictionary).decrypt_message()
+            return {'key': key, 'text': text}
+        shift = int(key) if op == 'encrypt' else -int(key)
+        return {'key': key, 'text': PlaintextMessage(text, shift % 26).get_message_text_encrypted()}
+
+    if cipher == 'vowel':
+        if key is None:
+            key, text = EncryptedSubMessage(text, dictionary).decrypt_message_skeleton()
+            return {'key': key, 'text': text}
+        if sorted(str(key).lower()) != sorted('aeiou'):
+            raise ValueError('vowel key must be a permutation of aeiou')
+        message = SubMessage(text)
+        perm = key if op == 'encrypt' else invert_vowels_permutation(key)
+        return {'key': key, 'text': message.apply_transpose(message.build_transpose_dict(perm))}
+
+    raise ValueError('unknown cipher %r' % (cipher,))
+
+def handle_batch(requests, dictionaries=None):
+    '''
+    requests (list of dicts): decoded requests
+    dictionaries (dict): dictionary name -> word list files, as resolved by
+    the service process. The registry is per process, so these are
+    registered here first, in case this runs in an executor process that
+    started before they were registered.
+
+    Returns: a list of responses, one per request in the same order.
+    Errors are reported in the response of the request that caused them,
+    whatever they are, so a bad request never fails the rest of its batch.
+    '''
+    for name, file_names in (dictionaries or {}).items():
+        ensure_dictionary(name, *file_names)
+    responses = []
+    for request in requests:
+        try:
+            response = handle_request(request)
+            response['ok'] = True
+        except Exception as error:
+            response = {'ok': False, 'error': str(error) or type(error).__name__}
+        responses.append(response)
+    return responses
+
+class CipherService(object):
+    '''
+    Collects requests from every connection into micro-batches and runs
+    each batch in an executor, so CPU-bound cracking never blocks the event
+    loop and the per-call executor overhead is shared by a whole batch.
+
+    Backpressure works at two levels: a connection stops reading once it
+    has CONNECTION_IN_FLIGHT unanswered requests, and every reader waits
+    when the shared queue of pending requests is full.
+    '''
+    def __init__(self, executor=None, workers=None, batch_size=BATCH_SIZE,
+                 batch_window=BATCH_WINDOW, queue_size=QUEUE_SIZE):
+        '''
+        executor (Executor): where batches run, defaults to a process pool
+        workers (integer): size of the default process pool, and the number
+        of batches that can run at once
+        batch_size (integer): the most requests handled per executor call
+        batch_window (float): seconds a partial batch waits for more requests
+        queue_size (integer): the most requests waiting to be batched
+        '''
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor or ProcessPoolExecutor(self.workers)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.queue_size = queue_size
+        self.queue = None
+        self.batchers = []
+
+    async def start(self):
+        '''
+        Starts the batching tasks. Called by serve.
+        '''
+        self.queue = asyncio.Queue(self.queue_size)
+        self.batchers = [asyncio.create_task(self._batcher()) for worker in range(self.workers)]
+
+    async def close(self):
+        '''
+        Stops the batching tasks and shuts the executor down.
+        '''
+        for batcher in self.batchers:
+            batcher.cancel()
+        await asyncio.gather(*self.batchers, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, request):
+        '''
+        request (dict): a decoded request
+
+        Returns: the response (dict). Waits first if the queue is full.
+        '''
+        # dictionaries are checked here, against the registry of this
+        # process, not the executor's
+        try:
+            check_dictionary(request)
+        except ValueError as error:
+            return {'ok': False, 'error': str(error)}
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            requests = [request for request, future in batch]
+            try:
+                names = {request['dictionary'] for request in requests if request.get('dictionary') is not None}
+                dictionaries = {name: dictionary_files(name) for name in names}
+                responses = await loop.run_in_executor(self.executor, handle_batch, requests, dictionaries)
+            except Exception as error:
+                responses = [{'ok': False, 'error': 'internal error: %s' % error}] * len(batch)
+            for (request, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    async def handle_connection(self, reader, writer):
+        '''
+        Serves one client until it closes the connection.
+        '''
+        in_flight = asyncio.Semaphore(CONNECTION_IN_FLIGHT)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(request_id, request):
+            try:
+                response = await self.submit(request) if request is not None else None
+                if response is None:
+                    response = {'ok': False, 'error': 'request must be a JSON object'}
+                response = dict(response, id=request_id)
+                async with write_lock:
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                await in_flight.acquire()
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # line longer than LINE_LIMIT, or the client went away
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    in_flight.release()
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                request_id = request.get('id') if isinstance(request, dict) else None
+                task = asyncio.create_task(answer(request_id, request if isinstance(request, dict) else None))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+async def serve(host='127.0.0.1', port=8765, unix_path=None, service=None):
+    '''
+    Runs the service until cancelled.
+
+    host (string), port (integer): where to listen for TCP clients
+    unix_path (string): if given, listen on this Unix socket instead
+    service (CipherService): defaults to one with a process pool
+    '''
+    service = service or CipherService()
+    await service.start()
+    if unix_path:
+        server = await asyncio.start_unix_server(service.handle_connection, unix_path, limit=LINE_LIMIT)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port, limit=LINE_LIMIT)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
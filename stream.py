@@ -0,0 +1,194 @@
+import sys
+from itertools import chain, islice
+
+from cipher import candidate_keys, cipher_table
+
+CHUNK_SIZE = 1 << 16            # characters read per chunk
+SAMPLE_WORDS = 2000             # words used to pick the key when cracking a stream
+SAMPLE_CHARS = 1 << 20          # characters at most read for that sample
+MAX_WORD = CHUNK_SIZE           # characters at most kept of a word spanning several chunks
+
+def open_input(path):
+    '''
+    path (string): a file name, or '-' for standard input
+
+    Returns: a text file object. Newlines are passed through untouched so
+    the output has exactly the same layout as the input.
+    '''
+    if path == '-':
+        return sys.stdin
+    return open(path, 'r', newline='')
+
+def open_output(path):
+    '''
+    path (string): a file name, or '-' for standard output
+
+    Returns: a writable text file object
+    '''
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', newline='')
+
+def iter_chunks(file_obj, chunk_size=CHUNK_SIZE):
+    '''
+    file_obj (file): an open text file or pipe
+    chunk_size (integer): the number of characters to read at a time
+
+    Returns: a generator of strings of at most chunk_size characters. Only
+    one chunk is held in memory at a time.
+    '''
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def translate_chunks(chunks, table):
+    '''
+    chunks (iterable of strings): the text, in pieces
+    table (dict): a translation table from cipher.py
+
+    Returns: a generator of the translated pieces. Both ciphers map single
+    characters to single characters, so chunks can be translated
+    independently of where the chunk boundaries fall.
+    '''
+    for chunk in chunks:
+        yield chunk.translate(table)
+
+def iter_words(chunks, max_word=MAX_WORD):
+    '''
+    chunks (iterable of strings): the text, in pieces
+    max_word (integer): the longest word kept whole
+
+    Returns: a generator of the whitespace separated words of the text.
+    A word split across chunks is put back together before it is yielded,
+    so scoring sees the same words it would see on the whole text. A word
+    growing past max_word characters, which cannot be valid anyway, is
+    yielded in pieces so that text without whitespace is read in linear
+    time and bounded memory.
+    '''
+    pieces = []                 # the start of a word that may continue in the next chunk
+    length = 0
+    for chunk in chunks:
+        words = chunk.split()
+        if pieces and (not words or chunk[0].isspace()):
+            yield ''.join(pieces)
+            pieces, length = [], 0
+        if not words:
+            continue
+        if pieces:
+            pieces.append(words[0])
+            length += len(words[0])
+            if len(words) == 1 and not chunk[-1].isspace():
+                # the whole chunk is still inside the same word
+                if length >= max_word:
+                    yield ''.join(pieces)
+                    pieces, length = [], 0
+                continue
+            words[0] = ''.join(pieces)
+            pieces, length = [], 0
+        # the last word may continue in the next chunk unless the chunk
+        # ended on whitespace
+        if not chunk[-1].isspace():
+            pieces = [words.pop()]
+            length = len(pieces[0])
+        yield from words
+    if pieces:
+        yield ''.join(pieces)
+
+def crack_chunks(chunks, cipher, lexicon, sample_words=SAMPLE_WORDS, sample_chars=SAMPLE_CHARS):
+    '''
+    chunks (iterable of strings): the encrypted text, in pieces
+    cipher (string): 'caesar' or 'vowel'
+    lexicon (Lexicon): the valid words
+    sample_words (integer): how many leading words are used to choose the key
+    sample_chars (integer): how many leading characters at most are read
+    for that sample, whatever the number of words in them
+
+    Picks the key that makes the most of the first sample_words words valid,
+    keeping only the chunks needed for that sample in memory, then decrypts
+    the rest of the stream as it is read.
+
+    Returns: a tuple of the best key and a generator of decrypted chunks
+    '''
+    # scoring is only needed when cracking; encrypting and decrypting with a
+    # known key start faster without it
+    from scoring import score_bag, token_bag
+
+    chunks = iter(chunks)
+    buffered = []
+
+    def buffering():
+        read = 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            yield chunk
+            read += len(chunk)
+            if read >= sample_chars:
+                return
+
+    sample = token_bag(islice(iter_words(buffering()), sample_words))
+
+    best_key = None
+    best_score = -1
+    for key in candidate_keys(cipher):
+        # keys are decryption keys, as in decrypt_message
+        score = score_bag(sample, key, cipher_table(cipher, key), lexicon)
+        if score > best_score:
+            best_key, best_score = key, score
+
+    table = cipher_table(cipher, best_key)
+    return best_key, translate_chunks(chain(buffered, chunks), table)
+
+def transform_file(src, dst, cipher, key, decrypt=False, chunk_size=CHUNK_SIZE):
+    '''
+    src (string): input file name, or '-' for standard input
+    dst (string): output file name, or '-' for standard output
+    cipher (string): 'caesar' or 'vowel'
+    key (integer or string): the shift or vowel permutation
+    decrypt (boolean): if True, undo key instead of applying it
+    chunk_size (integer): the number of characters processed at a time
+
+    Encrypts or decrypts src into dst in constant memory.
+
+    Returns: nothing
+    '''
+    table = cipher_table(cipher, key, decrypt)
+    infile = open_input(src)
+    outfile = open_output(dst)
+    try:
+        for chunk in translate_chunks(iter_chunks(infile, chunk_size), table):
+            outfile.write(chunk)
+    finally:
+        _close(infile, outfile)
+
+def crack_file(src, dst, cipher, lexicon, sample_words=SAMPLE_WORDS, chunk_size=CHUNK_SIZE):
+    '''
+    src (string): input file name, or '-' for standard input
+    dst (string): output file name, or '-' for standard output
+    cipher (string): 'caesar' or 'vowel'
+    lexicon (Lexicon): the valid words
+    sample_words (integer): how many leading words are used to choose the key
+    chunk_size (integer): the number of characters processed at a time
+
+    Decrypts src into dst without knowing the key, in bounded memory.
+
+    Returns: the key that was used to decrypt
+    '''
+    infile = open_input(src)
+    outfile = open_output(dst)
+    try:
+        key, decrypted = crack_chunks(iter_chunks(infile, chunk_size), cipher, lexicon, sample_words)
+        for chunk in decrypted:
+            outfile.write(chunk)
+    finally:
+        _close(infile, outfile)
+    return key
+
+def _close(infile, outfile):
+    if infile is not sys.stdin:
+        infile.close()
+    if outfile is sys.stdout:
+        outfile.flush()
+    else:
+        outfile.close()
@@ -0,0 +1,192 @@
+import string
+import threading
+from collections import Counter
+from itertools import permutations
+
+from lexicon import PUNCTUATION
+
+MASK = '*'
+MAX_BRUTE_FORCE = 7             # at most 7! = 5040 leftover assignments are tried
+
+class SkeletonIndex(object):
+    '''
+    The words of a lexicon grouped by skeleton: the word with every letter
+    of alphabet replaced by MASK. A substitution over alphabet never changes
+    a word's skeleton, so the dictionary words a ciphertext word can decrypt
+    to are exactly the ones sharing its skeleton.
+    '''
+    def __init__(self, lexicon, alphabet):
+        '''
+        lexicon (Lexicon): the valid words
+        alphabet (string): the lowercase letters the substitution permutes
+        '''
+        self.alphabet = alphabet
+        self.mask_table = str.maketrans(alphabet, MASK * len(alphabet))
+        others = ''.join(letter for letter in string.ascii_lowercase if letter not in alphabet)
+        self.keep_table = str.maketrans('', '', others)
+        self.patterns = {}      # skeleton -> set of strings of the masked letters
+        for word in lexicon:
+            self.patterns.setdefault(self.skeleton(word), set()).add(self.masked(word))
+
+    def skeleton(self, word):
+        '''
+        Returns: word (string) with the letters of the alphabet masked
+        '''
+        return word.translate(self.mask_table)
+
+    def masked(self, word):
+        '''
+        Returns: the letters of word (string) that belong to the alphabet,
+        in order
+        '''
+        return word.translate(self.keep_table)
+
+    def options(self, token):
+        '''
+        token (string): a normalized (lowercase, stripped) ciphertext word
+
+        Returns: the set of partial mappings (frozensets of (cipher letter,
+        plain letter) pairs) that turn token into a dictionary word
+        '''
+        cipher = self.masked(token)
+        result = set()
+        for plain in self.patterns.get(self.skeleton(token), ()):
+            mapping = {}
+            used = set()
+            for cipher_letter, plain_letter in zip(cipher, plain):
+                known = mapping.get(cipher_letter)
+                if known is None:
+                    if plain_letter in used:
+                        break
+                    mapping[cipher_letter] = plain_letter
+                    used.add(plain_letter)
+                elif known != plain_letter:
+                    break
+            else:
+                result.add(frozenset(mapping.items()))
+        return result
+
+
+_indexes = {}                   # (id of lexicon, alphabet) -> (lexicon, SkeletonIndex)
+_indexes_lock = threading.Lock()
+
+def get_skeleton_index(lexicon, alphabet):
+    '''
+    Returns: the SkeletonIndex of lexicon for alphabet, built on first use
+    and shared afterwards
+    '''
+    key = (id(lexicon), alphabet)
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry is None or entry[0] is not lexicon:
+            entry = (lexicon, SkeletonIndex(lexicon, alphabet))
+            _indexes[key] = entry
+    return entry[1]
+
+def substitution_table(mapping):
+    '''
+    mapping (dict): lowercase cipher letter -> lowercase plain letter
+
+    Returns: a str.translate table applying mapping to both cases
+    '''
+    cipher = ''.join(mapping)
+    plain = ''.join(mapping.values())
+    return str.maketrans(cipher + cipher.upper(), plain + plain.upper())
+
+def _consistent(option, assignment, used):
+    for cipher_letter, plain_letter in option:
+        known = assignment.get(cipher_letter)
+        if known is None:
+            if plain_letter in used:
+                return False
+        elif known != plain_letter:
+            return False
+    return True
+
+def solve_substitution(text, alphabet, lexicon, max_brute_force=MAX_BRUTE_FORCE):
+    '''
+    Recovers a substitution that permutes the letters of alphabet, such as
+    the vowel transposition of ps4c, without trying every key.
+
+    Every distinct word of text is looked up once in the skeleton index to
+    find the partial mappings that would make it a dictionary word. Words
+    with a single possible mapping fix letters; fixed letters rule out
+    options of other words, which may leave them with a single option in
+    turn, and so on. Letters still undecided when this stops are brute
+    forced, scoring only the distinct words that can become valid.
+
+    text (string): the encrypted text
+    alphabet (string): the lowercase letters that were permuted
+    lexicon (Lexicon): the valid words
+    max_brute_force (integer): the most undecided letters that are brute
+    forced; any beyond that keep an arbitrary unused plain letter
+
+    Returns: a tuple of the decryption mapping (dict of lowercase cipher
+    letter -> plain letter, covering all of alphabet) and the number of
+    words of text that it turns into valid words
+    '''
+    index = get_skeleton_index(lexicon, alphabet)
+    bag = Counter(word.lower().strip(PUNCTUATION) for word in text.split())
+
+    # words with no possible mapping can never count, whatever the key, and
+    # words without any letter of alphabet count for every key
+    candidates = {}
+    constant_score = 0
+    for token, count in bag.items():
+        if index.masked(token):
+            options = index.options(token)
+            if options:
+                candidates[token] = (count, options)
+        elif token in lexicon:
+            constant_score += count
+
+    assignment = {}
+    used = set()
+    while True:
+        votes = Counter()
+        for count, options in candidates.values():
+            options = [option for option in options if _consistent(option, assignment, used)]
+            if len(options) == 1:
+                for cipher_letter, plain_letter in options[0]:
+                    if cipher_letter not in assignment:
+                        votes[cipher_letter, plain_letter] += count
+        if not votes:
+            break
+
+        # take the best supported pair whose letters nothing else competes for;
+        # when every pair is contested the rest is ambiguous and is left to the
+        # brute force, unless too many letters are left for that
+        by_cipher = Counter(cipher_letter for cipher_letter, plain_letter in votes)
+        by_plain = Counter(plain_letter for cipher_letter, plain_letter in votes)
+        ranked = sorted(votes, key=lambda pair: -votes[pair])
+        for cipher_letter, plain_letter in ranked:
+            if by_cipher[cipher_letter] == 1 and by_plain[plain_letter] == 1:
+                break
+        else:
+            if len(alphabet) - len(assignment) <= max_brute_force:
+                break
+            cipher_letter, plain_letter = ranked[0]
+        assignment[cipher_letter] = plain_letter
+        used.add(plain_letter)
+
+    free_cipher = [letter for letter in alphabet if letter not in assignment]
+    free_plain = [letter for letter in alphabet if letter not in used]
+    brute_cipher = free_cipher[:max_brute_force]
+    # letters past the brute force limit keep the leftover plain letters in order
+    assignment.update(zip(free_cipher[max_brute_force:], free_plain[len(brute_cipher):]))
+    free_plain = free_plain[:len(brute_cipher)]
+
+    def score(mapping):
+        table = substitution_table(mapping)
+        return constant_score + sum(count for token, (count, options) in candidates.items()
+                                    if token.translate(table) in lexicon)
+
+    best = None
+    best_score = -1
+    for plain in permutations(free_plain):
+        mapping = dict(assignment)
+        mapping.update(zip(brute_cipher, plain))
+        mapping_score = score(mapping)
+        if mapping_score > best_score:
+            best, best_score = mapping, mapping_score
+    return ({letter: best[letter] for letter in alphabet}, best_score)
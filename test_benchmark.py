@@ -0,0 +1,23 @@
+import unittest
+
+from benchmark import compare
+
+
+def _run(**cases):
+    return {'results': [{'name': name, 'params': {}, 'min': fastest, 'p50': fastest * 2}
+                        for name, fastest in cases.items()]}
+
+
+class CompareTest(unittest.TestCase):
+    def test_noise_on_short_cases_is_ignored(self):
+        # 0.103 ms -> 0.136 ms is over the threshold but under min_delta
+        self.assertEqual(compare(_run(is_word=0.000136), _run(is_word=0.000103)), [])
+
+    def test_real_slowdowns_are_reported(self):
+        regressions = compare(_run(crack=0.010, shift=0.0101), _run(crack=0.005, shift=0.010))
+        self.assertEqual(regressions, [('crack{}', 0.005, 0.010)])
+        self.assertEqual(compare(_run(crack=0.010), _run(crack=0.005), min_delta=0.01), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
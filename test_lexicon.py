@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lexicon import (DEFAULT_DICTIONARY, WORDLIST_FILENAME, CompiledLexicon, compiled_path, get_dictionary,
+                     load_compiled_lexicon, register_dictionary)
+
+
+class CompiledLexiconTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'words.txt')
+        with open(self.source, 'w') as outfile:
+            outfile.write('hello world\nthree words here')
+        self.compiled = compiled_path(self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        lexicon = load_compiled_lexicon(self.source)
+        self.assertIsInstance(lexicon, CompiledLexicon)
+        return sorted(lexicon)
+
+    def test_truncated_file_is_rebuilt(self):
+        self.assertEqual(self.load(), ['hello', 'here', 'three', 'words', 'world'])
+        length = os.path.getsize(self.compiled)
+        for keep in (length - 1, length // 2, 3):
+            with open(self.compiled, 'r+b') as outfile:
+                outfile.truncate(keep)
+            with self.assertRaises(ValueError):
+                CompiledLexicon(self.compiled)
+            self.assertEqual(self.load(), ['hello', 'here', 'three', 'words', 'world'])
+            self.assertEqual(os.path.getsize(self.compiled), length)
+
+    def test_trailing_garbage_is_rebuilt(self):
+        self.load()
+        length = os.path.getsize(self.compiled)
+        with open(self.compiled, 'ab') as outfile:
+            outfile.write(b'junk')
+        self.assertEqual(self.load(), ['hello', 'here', 'three', 'words', 'world'])
+        self.assertEqual(os.path.getsize(self.compiled), length)
+
+    def test_newer_source_is_recompiled(self):
+        self.load()
+        with open(self.source, 'a') as outfile:
+            outfile.write(' again')
+        status = os.stat(self.source)
+        os.utime(self.source, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+        self.assertIn('again', self.load())
+
+
+class RegisterDictionaryTest(unittest.TestCase):
+    def test_replacing_the_default_dictionary(self):
+        directory = tempfile.mkdtemp()
+        try:
+            source = os.path.join(directory, 'words.txt')
+            with open(source, 'w') as outfile:
+                outfile.write('hello')
+            get_dictionary()
+            register_dictionary(DEFAULT_DICTIONARY, source)
+            try:
+                self.assertEqual(sorted(get_dictionary()), ['hello'])
+                self.assertEqual(sorted(get_dictionary(DEFAULT_DICTIONARY)), ['hello'])
+            finally:
+                register_dictionary(DEFAULT_DICTIONARY, WORDLIST_FILENAME)
+            self.assertGreater(len(get_dictionary()), 1)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from cipher import candidate_keys, shift_table
+from lexicon import get_lexicon, load_words, register_dictionary
+from parallel import _crack_chunk, _init_worker, _worker_args, count_keys_parallel
+from ps4b import PlaintextMessage
+from scoring import TOKEN_CACHE, score_bag, token_bag
+
+
+class CountKeysParallelTest(unittest.TestCase):
+    def test_threads_processes_and_serial_agree(self):
+        generator = random.Random(6001)
+        words = load_words('words.txt')
+        text = ' '.join(generator.choice(words) for word in range(40000))
+        encrypted = PlaintextMessage(text, 9).get_message_text_encrypted()
+
+        bag = token_bag(encrypted)
+        serial = {key: score_bag(bag, key, shift_table(key), get_lexicon(), cache=None)
+                  for key in candidate_keys('caesar')}
+
+        # a small shared cache and frequent thread switches keep the threads
+        # evicting each other's entries
+        maxsize = TOKEN_CACHE.maxsize
+        interval = sys.getswitchinterval()
+        TOKEN_CACHE.clear()
+        TOKEN_CACHE.maxsize = 2000
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = count_keys_parallel(encrypted, 'caesar', workers=8, shards=16, use_processes=False)
+        finally:
+            sys.setswitchinterval(interval)
+            TOKEN_CACHE.maxsize = maxsize
+            TOKEN_CACHE.clear()
+        processes = count_keys_parallel(encrypted, 'caesar', workers=2, shards=4, key_groups=2)
+        self.assertEqual(threads, serial)
+        self.assertEqual(processes, serial)
+        self.assertEqual(max(serial, key=serial.get), 17)
+
+
+class WorkerDictionaryTest(unittest.TestCase):
+    def test_spawned_workers_get_the_parent_dictionary(self):
+        directory = tempfile.mkdtemp()
+        try:
+            source = os.path.join(directory, 'mini.txt')
+            with open(source, 'w') as outfile:
+                outfile.write('hello world')
+            register_dictionary('parallel-test-mini', source)
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker,
+                                     initargs=_worker_args('parallel-test-mini')) as pool:
+                results = pool.submit(_crack_chunk, 0, ['Khoor Zruog'], 'caesar').result()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(results, [(0, 23, 'Hello World')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import random
+import unittest
+
+from cipher import candidate_keys
+from lexicon import get_lexicon, is_word, load_words
+from pipeline import Pipeline, crack_pipeline
+from scoring import TOKEN_CACHE
+
+
+class CrackPipelineTest(unittest.TestCase):
+    def test_short_texts_are_recovered(self):
+        generator = random.Random(6001)
+        words = load_words('words.txt')
+        for trial in range(12):
+            text = ' '.join(generator.choice(words) for word in range(5))
+            layered = Pipeline([('vowel', generator.choice(candidate_keys('vowel'))),
+                                ('caesar', generator.choice(candidate_keys('caesar')))])
+            found, decrypted = crack_pipeline(layered.encrypt(text))
+            # other keys may make equally valid words (sloshing, slushing)
+            self.assertTrue(all(is_word(get_lexicon(), word) for word in decrypted.split()), decrypted)
+
+    def test_confirming_leaves_the_shared_cache_alone(self):
+        groups = len(TOKEN_CACHE.groups)
+        secret = Pipeline([('vowel', 'eaiuo'), ('caesar', 3)]).encrypt('Hello World how are you')
+        self.assertEqual(crack_pipeline(secret)[1], 'Hello World how are you')
+        self.assertEqual(len(TOKEN_CACHE.groups), groups)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from itertools import permutations
+
+from ps4a import count_permutations, get_permutations, iter_permutations, permutation_at, permutation_index
+
+
+class PermutationsTest(unittest.TestCase):
+    SEQUENCES = ('a', 'ab', 'abc', 'abcde', 'aab', 'abab', 'mississ', 'aaa')
+
+    def test_counts_match_enumeration(self):
+        for sequence in self.SEQUENCES:
+            everything = list(iter_permutations(sequence))
+            distinct = list(iter_permutations(sequence, unique=True))
+            self.assertEqual(sorted(everything), sorted(''.join(p) for p in permutations(sequence)))
+            self.assertEqual(sorted(distinct), sorted(set(everything)))
+            self.assertEqual(len(distinct), len(set(distinct)))
+            self.assertEqual(count_permutations(sequence), len(everything))
+            self.assertEqual(count_permutations(sequence, unique=True), len(distinct))
+
+    def test_every_index_round_trips(self):
+        for sequence in self.SEQUENCES:
+            for unique in (False, True):
+                for index, permutation in enumerate(iter_permutations(sequence, unique)):
+                    self.assertEqual(permutation_at(sequence, index, unique), permutation)
+                    found = permutation_index(sequence, permutation, unique)
+                    self.assertEqual(permutation_at(sequence, found, unique), permutation)
+                    if unique or len(set(sequence)) == len(sequence):
+                        self.assertEqual(found, index)
+                    else:
+                        # repeated characters give the first matching position
+                        self.assertLessEqual(found, index)
+
+    def test_out_of_range(self):
+        with self.assertRaises(IndexError):
+            permutation_at('abc', 6)
+        with self.assertRaises(IndexError):
+            permutation_at('aab', 3, unique=True)
+        with self.assertRaises(ValueError):
+            permutation_index('abc', 'abd')
+
+    def test_get_permutations_returns_a_list(self):
+        self.assertEqual(get_permutations('abc'), ['abc', 'acb', 'bac', 'bca', 'cab', 'cba'])
+        self.assertEqual(get_permutations('aab', unique=True), ['aab', 'aba', 'baa'])
+        self.assertIsInstance(get_permutations('ab'), list)
+
+
+if __name__ == '__main__':
+    unittest.main()
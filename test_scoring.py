@@ -0,0 +1,58 @@
+import random
+import threading
+import unittest
+
+from cipher import shift_table
+from lexicon import Lexicon, get_lexicon, load_words
+from scoring import TokenCache, score_bag, token_bag
+
+
+class TokenCacheThreadsTest(unittest.TestCase):
+    def test_shared_cache_matches_uncached_scores(self):
+        lexicon = get_lexicon()
+        generator = random.Random(6001)
+        words = load_words('words.txt')
+        bags = [token_bag([generator.choice(words) for word in range(3000)]) for bag in range(4)]
+        expected = [[score_bag(bag, shift, shift_table(shift), lexicon, cache=None) for shift in range(26)]
+                    for bag in bags]
+
+        # small enough that threads keep evicting and trimming each other's groups
+        cache = TokenCache(maxsize=5000)
+        results = {}
+        errors = []
+
+        def work(thread):
+            try:
+                for round in range(3):
+                    for index, bag in enumerate(bags):
+                        scores = [score_bag(bag, shift, shift_table(shift), lexicon, cache=cache)
+                                  for shift in range(26)]
+                        results[thread, round, index] = scores
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for (thread, round, index), scores in results.items():
+            self.assertEqual(scores, expected[index])
+        self.assertEqual(cache.size, sum(len(group) for lexicon, group in cache.groups.values()))
+        self.assertLessEqual(cache.size, cache.maxsize)
+
+    def test_groups_belong_to_their_lexicon(self):
+        cache = TokenCache()
+        first = Lexicon(['hello'])
+        second = Lexicon(['world'])
+        self.assertEqual(cache.lookup(['khoor'], 23, shift_table(23), first), [True])
+        # as if second had been given the id of first once that was dropped
+        cache.groups[id(second), 23] = cache.groups.pop((id(first), 23))
+        self.assertEqual(cache.lookup(['khoor'], 23, shift_table(23), second), [False])
+        self.assertEqual(cache.size, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from lexicon import register_dictionary
+from service import CipherService, handle_batch
+
+
+class HandleBatchTest(unittest.TestCase):
+    def test_bad_request_only_fails_its_own_response(self):
+        responses = handle_batch([{'op': 'encrypt', 'key': 1e400, 'text': 'Hello'},
+                                  {'op': 'encrypt', 'cipher': 'caesar', 'key': 3, 'text': 'Hello'}])
+        self.assertFalse(responses[0]['ok'])
+        self.assertEqual(responses[1], {'ok': True, 'key': 3, 'text': 'Khoor'})
+
+    def test_dictionary_must_be_registered(self):
+        rejected, accepted = handle_batch([
+            {'op': 'decrypt', 'cipher': 'caesar', 'text': 'Khoor', 'dictionary': 'words.txt'},
+            {'op': 'decrypt', 'cipher': 'caesar', 'text': 'Khoor', 'dictionary': 'english'}])
+        self.assertFalse(rejected['ok'])
+        self.assertIn('unknown dictionary', rejected['error'])
+        self.assertEqual(accepted, {'ok': True, 'key': 23, 'text': 'Hello'})
+
+
+class CipherServiceTest(unittest.TestCase):
+    def test_dictionary_registered_after_the_executor_started(self):
+        directory = tempfile.mkdtemp()
+        source = os.path.join(directory, 'mini.txt')
+        with open(source, 'w') as outfile:
+            outfile.write('hello world')
+
+        async def run():
+            # spawned workers never see the registry of this process
+            executor = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn'))
+            service = CipherService(executor, workers=1)
+            await service.start()
+            try:
+                await service.submit({'op': 'encrypt', 'key': 1, 'text': 'warm up'})
+                register_dictionary('service-test-mini', source)
+                accepted = await service.submit({'op': 'decrypt', 'text': 'Khoor Zruog',
+                                                 'dictionary': 'service-test-mini'})
+                rejected = await service.submit({'op': 'decrypt', 'text': 'Khoor', 'dictionary': source})
+                return accepted, rejected
+            finally:
+                await service.close()
+
+        try:
+            accepted, rejected = asyncio.run(run())
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(accepted, {'ok': True, 'key': 23, 'text': 'Hello World'})
+        self.assertFalse(rejected['ok'])
+        self.assertIn('unknown dictionary', rejected['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import io
+import random
+import unittest
+
+from lexicon import get_lexicon
+from stream import crack_chunks, iter_chunks, iter_words
+
+
+class IterWordsTest(unittest.TestCase):
+    def test_words_match_split_whatever_the_chunks(self):
+        generator = random.Random(6001)
+        for trial in range(500):
+            text = ''.join(generator.choice('ab  \n') for letter in range(generator.randrange(60)))
+            size = generator.randrange(1, 8)
+            chunks = [text[start:start + size] for start in range(0, len(text), size)]
+            self.assertEqual(list(iter_words(chunks)), text.split())
+
+    def test_long_words_are_cut(self):
+        words = list(iter_words(['x' * 10] * 10, max_word=25))
+        self.assertEqual(''.join(words), 'x' * 100)
+        self.assertTrue(all(len(word) <= 30 for word in words))
+
+
+class CrackChunksTest(unittest.TestCase):
+    def test_sample_is_bounded_without_whitespace(self):
+        infile = io.StringIO('x' * 100000)
+        key, decrypted = crack_chunks(iter_chunks(infile, 1000), 'caesar', get_lexicon(), sample_chars=5000)
+        # only the sample was read to choose the key
+        self.assertEqual(infile.tell(), 5000)
+        self.assertEqual(len(''.join(decrypted)), 100000)
+
+
+if __name__ == '__main__':
+    unittest.main()
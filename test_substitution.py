@@ -0,0 +1,68 @@
+import random
+import unittest
+from itertools import permutations
+
+from lexicon import get_lexicon, load_words
+from substitution import solve_substitution, substitution_table
+
+
+def _encrypt(words, alphabet, generator):
+    # a random permutation of alphabet, and the text it encrypts words to
+    plain = list(alphabet)
+    generator.shuffle(plain)
+    encrypt = dict(zip(alphabet, plain))
+    decrypt = {cipher: plain for plain, cipher in encrypt.items()}
+    return ' '.join(words).translate(substitution_table(encrypt)), decrypt
+
+
+class SolveSubstitutionTest(unittest.TestCase):
+    def setUp(self):
+        self.lexicon = get_lexicon()
+        self.generator = random.Random(6001)
+        self.words = load_words('words.txt')
+
+    def test_recovers_vowel_keys(self):
+        for trial in range(5):
+            words = [self.generator.choice(self.words) for word in range(200)]
+            text, key = _encrypt(words, 'aeiou', self.generator)
+            mapping, score = solve_substitution(text, 'aeiou', self.lexicon)
+            self.assertEqual(mapping, key)
+            self.assertEqual(score, len(words))
+
+    def test_recovers_a_larger_alphabet(self):
+        alphabet = 'aeioustnrl'
+        words = [self.generator.choice(self.words) for word in range(2000)]
+        text, key = _encrypt(words, alphabet, self.generator)
+        mapping, score = solve_substitution(text, alphabet, self.lexicon)
+        self.assertEqual(mapping, key)
+        self.assertEqual(score, len(words))
+
+    def test_brute_force_finds_the_best_score(self):
+        # too few words to fix every letter, so the rest is brute forced;
+        # the result must score as well as trying every key
+        for trial in range(10):
+            words = [self.generator.choice(self.words) for word in range(2)]
+            text, key = _encrypt(words, 'aeiou', self.generator)
+            mapping, score = solve_substitution(text, 'aeiou', self.lexicon)
+            best = max(sum(word.translate(substitution_table(dict(zip('aeiou', plain)))) in self.lexicon
+                           for word in text.split())
+                       for plain in permutations('aeiou'))
+            self.assertEqual(score, best)
+            decrypted = text.translate(substitution_table(mapping)).split()
+            self.assertEqual(score, sum(word in self.lexicon for word in decrypted))
+
+    def test_letters_past_the_brute_force_limit_still_get_a_letter(self):
+        alphabet = 'aeioustnrl'
+        words = [self.generator.choice(self.words) for word in range(5)]
+        for text in (_encrypt(['xyz'], alphabet, self.generator)[0],
+                     _encrypt(words, alphabet, self.generator)[0]):
+            for max_brute_force in (0, 3):
+                mapping, score = solve_substitution(text, alphabet, self.lexicon, max_brute_force)
+                self.assertEqual(sorted(mapping), sorted(alphabet))
+                self.assertEqual(sorted(mapping.values()), sorted(alphabet))
+                decrypted = text.translate(substitution_table(mapping)).split()
+                self.assertEqual(score, sum(word in self.lexicon for word in decrypted))
+
+
+if __name__ == '__main__':
+    unittest.main()
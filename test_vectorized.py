@@ -0,0 +1,31 @@
+import unittest
+
+import vectorized
+from vectorized import shift_batch
+
+
+class ShiftBatchTest(unittest.TestCase):
+    RECORDS = ['abc', 'Hello, World!', b'xyz', '']
+    SHIFTS = [40000, -3, 2 ** 70, 25]
+
+    def fallback(self, shift):
+        numpy = vectorized.np
+        vectorized.np, vectorized.HAVE_NUMPY = None, False
+        try:
+            return shift_batch(self.RECORDS, shift)
+        finally:
+            vectorized.np, vectorized.HAVE_NUMPY = numpy, numpy is not None
+
+    def test_large_and_negative_shifts(self):
+        expected = ['mno', 'Ebiil, Tloia!', b'hij', '']
+        self.assertEqual(shift_batch(self.RECORDS, self.SHIFTS), expected)
+        self.assertEqual(self.fallback(self.SHIFTS), expected)
+
+    @unittest.skipUnless(vectorized.HAVE_NUMPY, 'NumPy is not installed')
+    def test_backends_agree(self):
+        for shift in (self.SHIFTS, 40000, -40001):
+            self.assertEqual(shift_batch(self.RECORDS, shift), self.fallback(shift))
+
+
+if __name__ == '__main__':
+    unittest.main()
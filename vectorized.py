@@ -0,0 +1,134 @@
+'''
+Batch Caesar cipher operations over many records at once. With NumPy
+installed, a batch is viewed as one uint8 matrix (one row per record, padded
+with zero bytes) and shifted or scored with whole-array operations. Without
+NumPy every function falls back to the pure Python implementation, record
+by record, and returns the same results.
+'''
+from cipher import apply_table, shift_table
+from frequency import ENGLISH_LETTER_FREQUENCIES, letter_histogram, shift_scores
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+def _encode(record):
+    # letters are ASCII and UTF-8 never uses ASCII bytes inside multi-byte
+    # characters, so shifting the encoded bytes only touches letters
+    return record.encode('utf-8') if isinstance(record, str) else bytes(record)
+
+def _to_matrix(records):
+    encoded = [_encode(record) for record in records]
+    lengths = np.fromiter((len(record) for record in encoded), dtype=np.int64, count=len(encoded))
+    width = int(lengths.max()) if len(encoded) else 0
+    matrix = np.zeros((len(encoded), width), dtype=np.uint8)
+    for row, record in enumerate(encoded):
+        matrix[row, :len(record)] = np.frombuffer(record, dtype=np.uint8)
+    return matrix, lengths
+
+def _from_matrix(matrix, lengths, records):
+    result = []
+    for row, (length, record) in enumerate(zip(lengths, records)):
+        data = matrix[row, :length].tobytes()
+        result.append(data.decode('utf-8') if isinstance(record, str) else data)
+    return result
+
+def _shift_matrix(matrix, shifts):
+    # shifts is a scalar or a column of one shift per row
+    values = matrix.astype(np.int16)
+    shifted = values
+    for first in (ord('a'), ord('A')):
+        is_letter = (values >= first) & (values < first + 26)
+        shifted = np.where(is_letter, (values - first + shifts) % 26 + first, shifted)
+    return shifted.astype(np.uint8)
+
+def shift_batch(records, shift):
+    '''
+    Equivalent of Message.apply_shift for many records at once.
+
+    records (list): strings or bytes, of any lengths
+    shift (integer or list of integers): one shift for every record, or one
+    shift per record
+
+    Returns: a list of the shifted records, each of the same type as the
+    corresponding input record
+    '''
+    records = list(records)
+    per_record = hasattr(shift, '__len__')
+    if not HAVE_NUMPY:
+        shifts = shift if per_record else [shift] * len(records)
+        return [apply_table(record, shift_table(value)) for record, value in zip(records, shifts)]
+    if not records:
+        return []
+    matrix, lengths = _to_matrix(records)
+    # reduced before the cast so that any integer shift fits
+    shifts = (np.asarray(shift) % 26).astype(np.int16).reshape(-1, 1) if per_record else shift % 26
+    return _from_matrix(_shift_matrix(matrix, shifts), lengths, records)
+
+def letter_histograms(records):
+    '''
+    records (list): strings or bytes
+
+    Returns: the 26 letter counts (a-z, ignoring capitalization) of every
+    record; an (n, 26) integer array with NumPy, a list of lists without
+    '''
+    records = list(records)
+    if not HAVE_NUMPY:
+        return [letter_histogram(_encode(record).decode('latin-1')) for record in records]
+    matrix, lengths = _to_matrix(records)
+    folded = (matrix | 0x20).astype(np.int64) - ord('a')     # lowercase the letters
+    is_letter = ((matrix | 0x20) >= ord('a')) & ((matrix | 0x20) <= ord('z'))
+    rows = np.nonzero(is_letter)[0]
+    index = rows * 26 + folded[is_letter]
+    return np.bincount(index, minlength=len(records) * 26).reshape(len(records), 26)
+
+def batch_shift_scores(records, expected=ENGLISH_LETTER_FREQUENCIES):
+    '''
+    records (list): Caesar encrypted strings or bytes
+
+    Returns: the chi-squared score of every record decrypted with every
+    shift (see frequency.shift_scores); an (n, 26) float array with NumPy,
+    computed for all records and shifts in one broadcasted operation, or a
+    list of lists without
+    '''
+    histograms = letter_histograms(records)
+    if not HAVE_NUMPY:
+        return [shift_scores(histogram, expected) for histogram in histograms]
+    expected = np.asarray(expected, dtype=np.float64)
+    expected = expected / expected.sum()
+    # rotated[:, shift, letter] is the count of letter after decrypting with shift
+    letters = np.arange(26)
+    rotation = (letters[np.newaxis, :] - letters[:, np.newaxis]) % 26
+    rotated = histograms[:, rotation]
+    totals = histograms.sum(axis=1).reshape(-1, 1, 1)
+    expected_counts = totals * expected
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(expected_counts > 0, (rotated - expected_counts) ** 2 / expected_counts, 0.0)
+    return terms.sum(axis=2)
+
+def best_shifts(records):
+    '''
+    records (list): Caesar encrypted strings or bytes
+
+    Returns: a list with, for every record, the shift (0-25) that best
+    decrypts it according to English letter frequencies
+    '''
+    scores = batch_shift_scores(records)
+    if not HAVE_NUMPY:
+        return [min(range(26), key=row.__getitem__) for row in scores]
+    return scores.argmin(axis=1).tolist()
+
+def decrypt_batch(records):
+    '''
+    Cracks many Caesar encrypted records at once by letter frequencies.
+
+    records (list): Caesar encrypted strings or bytes
+
+    Returns: a list of (best shift, decrypted record) tuples
+    '''
+    records = list(records)
+    shifts = best_shifts(records)
+    return list(zip(shifts, shift_batch(records, shifts)))